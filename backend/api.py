@@ -1,9 +1,23 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import contextmanager
 import mysql.connector
 from mysql.connector import Error
 from typing import List, Dict
+import asyncio
+import json
+import os
+import signal
+import time
+
+from bus import subscribe
+from ws_protocol import TagState, encode_deltas
+from intelligence.forecast_engine import forecast_series
+from intelligence.stats_engine import WINDOW_SIZE
+import tracing
+from response_cache import ResponseCache
+from db.schema import layout_changed, text_split
 
 app = FastAPI(
     title="OCP Monitor API",
@@ -21,39 +35,143 @@ app.add_middleware(
 
 # Clients WebSocket
 active_connections: List[WebSocket] = []
+# Clients en mode binaire (snapshot + deltas) → compression activée ou non
+binary_connections: Dict[WebSocket, bool] = {}
+tag_state = TagState()
+# Latences des lectures tracées par le collecteur, complétées par l'étape "broadcast"
+api_tracer = tracing.Tracer(sample_rate=1.0)
+
+# Cache des réponses REST (clé = route + paramètres), invalidé par le collecteur via le bus :
+# "nodes" à l'ajout d'un nœud, "measurements" et "node:<id>" à chaque lot de mesures.
+# Les TTL ne couvrent que le cas où le bus est muet (collecteur arrêté, autre écrivain).
+response_cache = ResponseCache()
+NODES_TTL = 300.0
+LATEST_TTL = 10.0
+HISTORY_TTL = 60.0
+FORECAST_TTL = 5.0  # le temps restant avant les seuils dépend de l'heure courante
+
+async def _drop(connection: WebSocket):
+    # Client retiré des diffusions : on ferme aussi la socket, sinon il reste connecté sans rien recevoir
+    try:
+        await connection.close()
+    except Exception:
+        pass
 
 async def broadcast(message: dict):
     disconnected = []
-    for connection in active_connections:
+    for connection in list(active_connections):
         try:
             await connection.send_json(message)
         except Exception:
             disconnected.append(connection)
     for conn in disconnected:
-        active_connections.remove(conn)
+        if conn in active_connections:
+            active_connections.remove(conn)
+        await _drop(conn)
     print(f"Broadcast envoyé à {len(active_connections)} clients : {message.get('type')}")
 
+async def broadcast_binary(messages: List[dict]):
+    new_tags, numeric, texts = tag_state.apply(messages)
+    if not binary_connections or not (new_tags or numeric or texts):
+        return
+
+    # Encodage une seule fois par lot (et par mode de compression), hors de la boucle des clients
+    frames = {}
+    if numeric:
+        frames = {compress: encode_deltas(numeric, compress=compress)
+                  for compress in set(binary_connections.values())}
+    disconnected = []
+    # Copie : un client peut s'inscrire pendant un await
+    for connection, compress in list(binary_connections.items()):
+        try:
+            if new_tags:
+                await connection.send_json({"type": "tags", "data": new_tags})
+            for frame in frames.get(compress, ()):
+                await connection.send_bytes(frame)
+            if texts:
+                await connection.send_json({"type": "text_delta", "data": texts})
+        except Exception:
+            disconnected.append(connection)
+    for conn in disconnected:
+        binary_connections.pop(conn, None)
+        await _drop(conn)
+
+async def broadcast_batch(messages: List[dict]):
+    # Messages de contrôle du collecteur : nouveaux nœuds → cache /nodes invalidé
+    if any(message.get("type") == "nodes_changed" for message in messages):
+        response_cache.invalidate("nodes")
+        messages = [message for message in messages if message.get("type") != "nodes_changed"]
+    # Nouvelles mesures → dernières mesures et historiques des nœuds concernés invalidés
+    node_tags = {f"node:{message['data']['id']}" for message in messages
+                 if message.get("type") == "new_measurement" and (message.get("data") or {}).get("id") is not None}
+    if node_tags:
+        response_cache.invalidate("measurements", *node_tags)
+    traces = [message.pop("trace") for message in messages if "trace" in message]
+    if active_connections:
+        for message in messages:
+            await broadcast(message)
+    await broadcast_binary(messages)
+    now = time.time()
+    for trace in traces:
+        trace["broadcast"] = now
+        api_tracer.finish(trace)
+
+# Abonnement au bus local alimenté par le collecteur (main.py)
+@app.on_event("startup")
+async def start_bus_subscriber():
+    app.state.bus_task = asyncio.create_task(subscribe(broadcast_batch))
+
+@app.on_event("shutdown")
+async def stop_bus_subscriber():
+    app.state.bus_task.cancel()
+
 # ROUTE WEBSOCKET – OBLIGATOIRE
+# protocol=json (défaut) : un message JSON par mesure
+# protocol=binary : snapshot JSON puis deltas binaires (voir ws_protocol.py), compress=true pour zlib
 @app.websocket("/ws/measurements")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, protocol: str = "json", compress: bool = False):
     await websocket.accept()
+    if protocol == "binary":
+        await binary_websocket(websocket, compress)
+        return
     active_connections.append(websocket)
     print("Nouveau client WebSocket connecté")
     try:
-        latest = get_latest_measurements(50)
+        latest = query_latest_measurements(50)
         print(f"Envoi initial : {len(latest)} mesures")
         await websocket.send_json({"type": "initial", "data": latest})
 
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        if websocket in active_connections:
+            active_connections.remove(websocket)
         print("Client WebSocket déconnecté")
     except Exception as e:
         print(f"Erreur WebSocket : {e}")
         if websocket in active_connections:
             active_connections.remove(websocket)
 
+async def binary_websocket(websocket: WebSocket, compress: bool):
+    print("Nouveau client WebSocket connecté (binaire)")
+    try:
+        if not tag_state.loaded:
+            tag_state.load(get_latest_per_node())
+        # Snapshot et inscription sans await entre les deux : un lot du bus traité pendant
+        # l'envoi du snapshot arrive à ce client sous forme de deltas au lieu d'être perdu
+        snapshot = tag_state.snapshot()
+        binary_connections[websocket] = compress
+        await websocket.send_json(snapshot)
+
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        print("Client WebSocket déconnecté (binaire)")
+    except Exception as e:
+        print(f"Erreur WebSocket : {e}")
+    finally:
+        binary_connections.pop(websocket, None)
+
 # DB config
 DB_CONFIG = {
     "host": "localhost",
@@ -69,36 +187,69 @@ def get_db():
         conn = mysql.connector.connect(**DB_CONFIG)
         yield conn
     except Error as e:
+        # Colonne / table inconnue : migration 4 appliquée (ou annulée) depuis la détection,
+        # la disposition du schéma (text_split) est relue à la requête suivante
+        layout_changed(e)
         raise HTTPException(status_code=500, detail=f"DB error: {str(e)}")
     finally:
         if conn and conn.is_connected():
             conn.close()
 
+def _recent_rows_sql(where: str) -> str:
+    """Numeric and text rows, newest first; each side reads its (node_id, timestamp) index up to LIMIT."""
+    return f"""
+            SELECT u.id, u.node_id, u.numeric_value, u.text_value, u.timestamp FROM (
+                (SELECT id, node_id, value AS numeric_value, NULL AS text_value, timestamp
+                 FROM measurements {where} ORDER BY timestamp DESC LIMIT %s)
+                UNION ALL
+                (SELECT id, node_id, NULL, text_value, timestamp
+                 FROM measurements_text {where} ORDER BY timestamp DESC LIMIT %s)
+            ) u ORDER BY u.timestamp DESC LIMIT %s
+    """
+
 @app.get("/")
 def read_root():
     return {"message": "Bienvenue sur l'API OCP Monitor !", "docs": "/docs"}
 
 @app.get("/nodes", response_model=List[Dict])
-def get_nodes():
+def get_nodes(request: Request):
+    return response_cache.respond(request, query_nodes, ttl=NODES_TTL, tags=("nodes",))
+
+def query_nodes():
     with get_db() as conn:
         cur = conn.cursor(dictionary=True)
         cur.execute("SELECT * FROM nodes ORDER BY id")
         return cur.fetchall()
 
 @app.get("/measurements/latest", response_model=List[Dict])
-def get_latest_measurements(limit: int = 50):
+def get_latest_measurements(request: Request, limit: int = 50):
+    return response_cache.respond(request, lambda: query_latest_measurements(limit),
+                                  ttl=LATEST_TTL, tags=("nodes", "measurements"))
+
+def query_latest_measurements(limit: int = 50):
     with get_db() as conn:
         cur = conn.cursor(dictionary=True)
-        cur.execute("""
-            SELECT 
-                n.name, n.node_id, n.category, n.unit,
-                m.value AS numeric_value, m.text_value,
-                m.timestamp, m.timestamp AS readable_time
-            FROM measurements m
-            JOIN nodes n ON m.node_id = n.id
-            ORDER BY m.timestamp DESC
-            LIMIT %s
-        """, (limit,))
+        if text_split(conn):
+            cur.execute(f"""
+                SELECT
+                    n.name, n.node_id, n.category, n.unit,
+                    m.numeric_value, m.text_value,
+                    m.timestamp, m.timestamp AS readable_time
+                FROM ({_recent_rows_sql("")}) m
+                JOIN nodes n ON m.node_id = n.id
+                ORDER BY m.timestamp DESC
+            """, (limit, limit, limit))
+        else:
+            cur.execute("""
+                SELECT 
+                    n.name, n.node_id, n.category, n.unit,
+                    m.value AS numeric_value, m.text_value,
+                    m.timestamp, m.timestamp AS readable_time
+                FROM measurements m
+                JOIN nodes n ON m.node_id = n.id
+                ORDER BY m.timestamp DESC
+                LIMIT %s
+            """, (limit,))
         rows = cur.fetchall()
         for row in rows:
             row['timestamp'] = str(row['timestamp'])
@@ -106,24 +257,141 @@ def get_latest_measurements(limit: int = 50):
         return rows
 
 @app.get("/measurements/{node_id}", response_model=List[Dict])
-def get_measurements_by_node(node_id: int, limit: int = 100):
+def get_measurements_by_node(request: Request, node_id: int, limit: int = 100):
+    return response_cache.respond(request, lambda: query_measurements_by_node(node_id, limit),
+                                  ttl=HISTORY_TTL, tags=("nodes", f"node:{node_id}"))
+
+def query_measurements_by_node(node_id: int, limit: int = 100):
     with get_db() as conn:
         cur = conn.cursor(dictionary=True)
-        cur.execute("""
-            SELECT 
-                m.id, n.name, n.node_id, n.category, n.unit,
-                m.value AS numeric_value, m.text_value,
-                m.timestamp, m.timestamp AS readable_time
-            FROM measurements m
-            JOIN nodes n ON m.node_id = n.id
-            WHERE m.node_id = %s
-            ORDER BY m.timestamp DESC
-            LIMIT %s
-        """, (node_id, limit))
+        if text_split(conn):
+            cur.execute(f"""
+                SELECT
+                    m.id, n.name, n.node_id, n.category, n.unit,
+                    m.numeric_value, m.text_value,
+                    m.timestamp, m.timestamp AS readable_time
+                FROM ({_recent_rows_sql("WHERE node_id = %s")}) m
+                JOIN nodes n ON m.node_id = n.id
+                ORDER BY m.timestamp DESC
+            """, (node_id, limit, node_id, limit, limit))
+        else:
+            cur.execute("""
+                SELECT 
+                    m.id, n.name, n.node_id, n.category, n.unit,
+                    m.value AS numeric_value, m.text_value,
+                    m.timestamp, m.timestamp AS readable_time
+                FROM measurements m
+                JOIN nodes n ON m.node_id = n.id
+                WHERE m.node_id = %s
+                ORDER BY m.timestamp DESC
+                LIMIT %s
+            """, (node_id, limit))
         rows = cur.fetchall()
         if not rows:
             raise HTTPException(status_code=404, detail="No measurements found")
         for row in rows:
             row['timestamp'] = str(row['timestamp'])
             row['readable_time'] = str(row['readable_time'])
-        return rows
\ No newline at end of file
+        return rows
+
+def get_latest_per_node() -> List[Dict]:
+    """Latest measurement of every node, keyed by nodes.id (état initial du mode binaire)."""
+    with get_db() as conn:
+        cur = conn.cursor(dictionary=True)
+        split = text_split(conn)
+        tables = [("measurements", "m.value AS numeric_value, NULL AS text_value" if split
+                   else "m.value AS numeric_value, m.text_value")]
+        if split:
+            tables.append(("measurements_text", "NULL AS numeric_value, m.text_value"))
+        latest: Dict[int, Dict] = {}
+        for table, columns in tables:
+            cur.execute(f"""
+                SELECT
+                    n.id, n.node_id, n.name, n.category, n.unit,
+                    {columns}, UNIX_TIMESTAMP(m.timestamp) AS timestamp
+                FROM nodes n
+                JOIN {table} m ON m.id = (
+                    SELECT m2.id FROM {table} m2
+                    WHERE m2.node_id = n.id
+                    ORDER BY m2.timestamp DESC
+                    LIMIT 1
+                )
+            """)
+            for row in cur.fetchall():
+                kept = latest.get(row['id'])
+                if kept is None or row['timestamp'] > kept['timestamp']:
+                    latest[row['id']] = row
+        rows = list(latest.values())
+        for row in rows:
+            row['timestamp'] = float(row['timestamp']) if row['timestamp'] is not None else None
+        return rows
+
+@app.get("/forecast/{node_id}", response_model=Dict)
+def get_forecast(request: Request, node_id: int, window: int = WINDOW_SIZE):
+    """Tendance linéaire sur les `window` dernières mesures et temps restant avant les seuils."""
+    return response_cache.respond(request, lambda: compute_forecast(node_id, window),
+                                  ttl=FORECAST_TTL, tags=("nodes", f"node:{node_id}"))
+
+def compute_forecast(node_id: int, window: int = WINDOW_SIZE):
+    with get_db() as conn:
+        cur = conn.cursor(dictionary=True)
+        # Après la migration 4, measurements ne contient que des valeurs numériques (lecture par l'index couvrant)
+        numeric_only = "" if text_split(conn) else "AND m.text_value IS NULL"
+        cur.execute(f"""
+            SELECT n.name, n.node_id, m.value AS numeric_value, UNIX_TIMESTAMP(m.timestamp) AS ts
+            FROM measurements m
+            JOIN nodes n ON m.node_id = n.id
+            WHERE m.node_id = %s {numeric_only}
+            ORDER BY m.timestamp DESC
+            LIMIT %s
+        """, (node_id, window))
+        rows = cur.fetchall()
+    if not rows:
+        raise HTTPException(status_code=404, detail="No measurements found")
+    result = forecast_series(
+        rows[0]['name'],
+        [float(r['ts']) for r in rows],
+        [float(r['numeric_value']) for r in rows],
+    )
+    result['node_id'] = rows[0]['node_id']
+    result['id'] = node_id
+    return result
+
+@app.get("/metrics/latency", response_model=Dict)
+def get_latency_metrics():
+    """Histogrammes de latence par étape : collecteur (fichier data/latency.json) et API."""
+    collector = None
+    try:
+        with open(tracing.LATENCY_PATH, "r", encoding="utf-8") as f:
+            collector = json.load(f)
+    except (OSError, ValueError):
+        pass
+    return {"collector": collector, "api": api_tracer.snapshot(), "cache": response_cache.stats()}
+
+@app.post("/debug/profile", response_model=Dict)
+def profile_collector(seconds: float = Query(10, gt=0, le=tracing.MAX_PROFILE_SECONDS)):
+    """Déclenche un profil par échantillonnage du collecteur pendant `seconds` secondes (60 s max)."""
+    if not hasattr(signal, "SIGUSR1"):
+        raise HTTPException(status_code=501, detail="Profilage par signal non supporté sur cette plateforme")
+    if tracing.profile_running():
+        raise HTTPException(status_code=409, detail="Un profil est déjà en cours")
+    # Fichier PID absent ou périmé (collecteur arrêté, PID réutilisé) : ne jamais signaler un autre processus
+    pid = tracing.collector_pid()
+    if pid is None:
+        raise HTTPException(status_code=503, detail="Collecteur non démarré")
+    try:
+        with open(tracing.PROFILE_REQUEST_PATH, "w", encoding="utf-8") as f:
+            json.dump({"seconds": seconds}, f)
+        os.kill(pid, signal.SIGUSR1)
+    except OSError as e:
+        raise HTTPException(status_code=503, detail=f"Collecteur injoignable : {e}")
+    return {"status": "started", "pid": pid, "seconds": seconds, "result": "/debug/profile/latest"}
+
+@app.get("/debug/profile/latest", response_class=PlainTextResponse)
+def get_latest_profile():
+    """Dernier profil (piles agrégées, format flamegraph)."""
+    profiles = tracing.latest_profiles(1)
+    if not profiles:
+        raise HTTPException(status_code=404, detail="No profile found")
+    with open(profiles[0], "r", encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,159 @@
+"""Local pub/sub bus between the collector process and the API workers.
+
+The collector binds a Unix domain socket (TCP on localhost where AF_UNIX is not
+available) and publishes batches of messages. Every API worker process
+connects as a subscriber and fans the messages out to its own WebSocket
+clients.
+
+Frame layout: 4-byte magic, 1-byte frame type, 4-byte big-endian payload
+length, then the payload (a compact JSON array of messages).
+"""
+import asyncio
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional
+
+MAGIC = b"OCPB"
+HEADER = struct.Struct("!4sBI")
+FRAME_BATCH = 1
+
+FLUSH_INTERVAL = 0.05  # seconds between batch frames
+SEND_TIMEOUT = 1.0     # slow subscribers are dropped after this delay
+
+if hasattr(socket, "AF_UNIX"):
+    BUS_ADDRESS = os.environ.get("OCP_BUS_PATH", os.path.join(tempfile.gettempdir(), "ocp_monitor_bus.sock"))
+else:
+    BUS_ADDRESS = ("127.0.0.1", int(os.environ.get("OCP_BUS_PORT", "8765")))
+
+
+def encode_frame(messages: List[dict], frame_type: int = FRAME_BATCH) -> bytes:
+    payload = json.dumps(messages, default=str, separators=(",", ":")).encode("utf-8")
+    return HEADER.pack(MAGIC, frame_type, len(payload)) + payload
+
+
+def decode_payload(payload: bytes) -> List[dict]:
+    return json.loads(payload.decode("utf-8"))
+
+
+class BusPublisher:
+    """Collector side: accepts subscribers and sends them batched frames."""
+
+    def __init__(self, address=None, flush_interval: float = FLUSH_INTERVAL):
+        self.address = address or BUS_ADDRESS
+        self.flush_interval = flush_interval
+        self.server: Optional[socket.socket] = None
+        self.subscribers: List[socket.socket] = []
+        self.pending: List[dict] = []
+        self.lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return
+        if isinstance(self.address, str):
+            try:
+                os.unlink(self.address)
+            except FileNotFoundError:
+                pass
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen()
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._flush_loop, daemon=True).start()
+        print(f"Bus local démarré sur {self.address}")
+
+    def close(self):
+        self.running = False
+        if self.server:
+            self.server.close()
+            self.server = None
+        with self.lock:
+            for sub in self.subscribers:
+                sub.close()
+            self.subscribers = []
+        if isinstance(self.address, str):
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+    def publish(self, message: dict):
+        """Queue a message; it is sent with the next batch frame."""
+        with self.lock:
+            self.pending.append(message)
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            conn.settimeout(SEND_TIMEOUT)
+            with self.lock:
+                self.subscribers.append(conn)
+            print(f"Bus : abonné connecté ({len(self.subscribers)} au total)")
+
+    def _flush_loop(self):
+        while self.running:
+            time.sleep(self.flush_interval)
+            with self.lock:
+                if not self.pending:
+                    continue
+                batch, self.pending = self.pending, []
+                subscribers = list(self.subscribers)
+            if not subscribers:
+                continue
+
+            frame = encode_frame(batch)
+            dropped = []
+            for sub in subscribers:
+                try:
+                    sub.sendall(frame)
+                except OSError:
+                    dropped.append(sub)
+            if dropped:
+                with self.lock:
+                    for sub in dropped:
+                        sub.close()
+                        if sub in self.subscribers:
+                            self.subscribers.remove(sub)
+
+
+async def subscribe(handler: Callable[[List[dict]], Awaitable[None]], address=None, retry_delay: float = 1.0):
+    """API side: read batch frames forever and pass each batch to `handler`.
+
+    Reconnects when the collector is not running or restarts.
+    """
+    address = address or BUS_ADDRESS
+    while True:
+        writer = None
+        try:
+            if isinstance(address, str):
+                reader, writer = await asyncio.open_unix_connection(address)
+            else:
+                reader, writer = await asyncio.open_connection(*address)
+            print(f"Abonné au bus local {address}")
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                magic, frame_type, length = HEADER.unpack(header)
+                if magic != MAGIC:
+                    raise ValueError("trame invalide sur le bus")
+                payload = await reader.readexactly(length)
+                if frame_type == FRAME_BATCH:
+                    await handler(decode_payload(payload))
+        except asyncio.CancelledError:
+            raise
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            await asyncio.sleep(retry_delay)
+        finally:
+            if writer:
+                writer.close()
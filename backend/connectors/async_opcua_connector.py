@@ -0,0 +1,307 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+
+from asyncua import Client, ua
+from asyncua.ua import NodeClass
+
+from normalizer.opcua_normalizer import to_unix
+
+READ_CHUNK = 500  # nodes per Read request when the server announces no MaxNodesPerRead
+
+
+class _DataChangeHandler:
+    """Bridge asyncua data change notifications to a plain callback(item)."""
+
+    def __init__(self, callback: Callable[[Dict], None], names: Dict[str, str]):
+        self.callback = callback
+        self.names = names
+
+    def datachange_notification(self, node, val, data):
+        if val is None:
+            return
+        nid = node.nodeid.to_string()
+        received = time.time()
+        dv = data.monitored_item.Value
+        self.callback({
+            "name": self.names.get(nid, nid),
+            "nodeid": nid,
+            "value": val,
+            "source_ts": to_unix(dv.SourceTimestamp),
+            "server_ts": to_unix(dv.ServerTimestamp),
+            "received_ts": received,
+            "timestamp": received,
+        })
+
+
+class AsyncOPCUAConnector:
+    """Asyncio OPC UA connector using asyncua (FreeOpcUa's async stack).
+
+    Same surface as OPCUAConnector, but every call is a coroutine so one event
+    loop can drive many servers. Reads of several nodes are sent as Read
+    service requests of at most the server's MaxNodesPerRead nodes, pipelined
+    over the same secure channel, as are browse requests of sibling nodes.
+
+    Features:
+    - connect / disconnect / reconnect (with backoff)
+    - browse nodes recursively (limited depth)
+    - read single node value / batch read
+    - realtime async generator reading a list of node ids
+    - data change subscriptions
+    """
+
+    def __init__(self, endpoint: str, username: str = None, password: str = None, security: str = "None",
+                 max_concurrency: int = 32, timeout: float = 10):
+        self.endpoint = endpoint
+        self.username = username
+        self.password = password
+        self.security = security
+        self.timeout = timeout
+        self.client = self._new_client()
+        # Bounds the number of outstanding requests pipelined on the channel
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._names: Dict[str, str] = {}
+        self._max_nodes_per_read: Optional[int] = None  # read from the server once per session
+        self._subscriptions = []
+
+    def _new_client(self) -> Client:
+        # timeout = délai de réponse de chaque requête ; la durée de session reste celle d'asyncua (1 h)
+        client = Client(url=self.endpoint, timeout=self.timeout)
+        if self.username and self.password:
+            client.set_user(self.username)
+            client.set_password(self.password)
+        return client
+
+    async def connect(self, timeout: float = None):
+        """Connect to the OPC UA server.
+
+        `timeout` (seconds) bounds each request of the connection handshake
+        and later calls; it defaults to the value given to the constructor.
+        """
+        if timeout is not None and timeout != self.timeout:
+            self.timeout = timeout
+            self.client = self._new_client()
+        await self.client.connect()
+        self._max_nodes_per_read = None
+        print(f"✅ Connecté au serveur OPC UA (async) : {self.endpoint}")
+
+    async def disconnect(self):
+        """Disconnect (safe)."""
+        try:
+            await self.client.disconnect()
+        except Exception:
+            pass
+        self._subscriptions = []
+        print(f"🔌 Déconnecté : {self.endpoint}")
+
+    async def reconnect(self, retries: int = 5, delay: float = 1.0) -> bool:
+        """Drop the current session and reconnect with exponential backoff.
+
+        Returns True on success, False once all retries are exhausted.
+        Subscriptions are not restored; callers must subscribe again.
+        """
+        await self.disconnect()
+        for attempt in range(retries):
+            try:
+                self.client = self._new_client()
+                await self.connect()
+                return True
+            except Exception as e:
+                print(f"Reconnexion {attempt + 1}/{retries} échouée : {e}")
+                await asyncio.sleep(delay * (2 ** attempt))
+        return False
+
+    def get_root(self):
+        """Return the root node object."""
+        return self.client.get_root_node()
+
+    async def _browse_child(self, child, level: int, max_level: int) -> List[Dict]:
+        nodes = []
+        try:
+            async with self._semaphore:
+                node_class = await child.read_node_class()
+            # Keep only Variables (sensors / data nodes)
+            if node_class == NodeClass.Variable:
+                async with self._semaphore:
+                    browse_name = await child.read_browse_name()
+                name = getattr(browse_name, "Name", str(child.nodeid))
+                nid = child.nodeid.to_string()
+                self._names[nid] = name
+                nodes.append({"nodeid": nid, "name": name, "level": level})
+
+            # Always continue browsing children to find variables deeper in the tree
+            nodes.extend(await self.browse_nodes(child, level + 1, max_level))
+        except Exception:
+            # ignore errors for individual children to be robust to server quirks
+            pass
+        return nodes
+
+    async def browse_nodes(self, node, level: int = 0, max_level: int = 3) -> List[Dict]:
+        """Recursively browse children up to max_level and return a list of VARIABLE node info dicts.
+
+        Each dict contains: nodeid, name, level
+        Only nodes with NodeClass.Variable are returned to avoid system nodes.
+        Siblings are browsed concurrently.
+        """
+        if level > max_level:
+            return []
+
+        try:
+            async with self._semaphore:
+                children = await node.get_children()
+        except Exception:
+            return []
+
+        results = await asyncio.gather(*(self._browse_child(c, level, max_level) for c in children))
+        return [n for sub in results for n in sub]
+
+    async def _read_limit(self) -> int:
+        """Nodes per Read request: the server's OperationLimits/MaxNodesPerRead, READ_CHUNK if unset."""
+        if self._max_nodes_per_read is None:
+            try:
+                node = self.client.get_node(ua.NodeId(ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead))
+                async with self._semaphore:
+                    limit = int(await node.read_value() or 0)
+            except Exception:
+                limit = 0
+            self._max_nodes_per_read = limit if limit > 0 else READ_CHUNK
+        return self._max_nodes_per_read
+
+    async def _read_attribute(self, nodes, attribute) -> List:
+        """One attribute of many nodes, split to the server's operation limit; chunks are pipelined."""
+        limit = await self._read_limit()
+
+        async def read(chunk):
+            async with self._semaphore:
+                return await self.client.read_attributes(chunk, attribute)
+
+        results = await asyncio.gather(*(read(nodes[i:i + limit]) for i in range(0, len(nodes), limit)))
+        return [dv for chunk in results for dv in chunk]
+
+    async def _resolve_names(self, nodes):
+        """Read the BrowseName of every node not yet named, in batched Read requests.
+
+        Node ids loaded from the catalog are never browsed in this process.
+        """
+        missing = [node for node in nodes if node.nodeid.to_string() not in self._names]
+        if not missing:
+            return
+        try:
+            results = await self._read_attribute(missing, ua.AttributeIds.BrowseName)
+        except Exception:
+            return
+        for node, dv in zip(missing, results):
+            name = getattr(dv.Value.Value, "Name", None) if dv.StatusCode.is_good() and dv.Value else None
+            if name:
+                self._names[node.nodeid.to_string()] = name
+
+    async def _name_of(self, node) -> str:
+        nid = node.nodeid.to_string()
+        if nid not in self._names:
+            browse_name = await node.read_browse_name()
+            self._names[nid] = getattr(browse_name, "Name", nid)
+        return self._names[nid]
+
+    async def read_value(self, node_id: str):
+        """Read a single node and return a dict with readable name and value.
+
+        Returns None on error or if the value is None.
+        """
+        try:
+            node = self.client.get_node(node_id)
+            async with self._semaphore:
+                dv = await node.read_data_value()
+                received = time.time()
+                value = dv.Value.Value if dv.Value is not None else None
+                if value is None:
+                    return None
+                name = await self._name_of(node)
+            return {
+                "name": name,
+                "nodeid": node.nodeid.to_string(),
+                "value": value,
+                "source_ts": to_unix(dv.SourceTimestamp),
+                "server_ts": to_unix(dv.ServerTimestamp),
+                "received_ts": received,
+            }
+        except Exception:
+            return None
+
+    async def read_values(self, node_ids: List[str]) -> List[Dict]:
+        """Read many nodes in as few Read requests as the server's MaxNodesPerRead allows.
+
+        Names of nodes read for the first time are fetched with one batched
+        BrowseName read. Skips nodes whose value is None or which cannot be
+        read. Falls back to concurrent single reads if the batched requests fail.
+        """
+        nodes = [self.client.get_node(nid) for nid in node_ids]
+        try:
+            results = await self._read_attribute(nodes, ua.AttributeIds.Value)
+            received = time.time()
+        except Exception:
+            items = await asyncio.gather(*(self.read_value(nid) for nid in node_ids))
+            return [item for item in items if item]
+
+        good = []
+        for node, dv in zip(nodes, results):
+            try:
+                if dv.StatusCode.is_good() and dv.Value is not None and dv.Value.Value is not None:
+                    good.append((node, dv))
+            except Exception:
+                continue
+        await self._resolve_names([node for node, _ in good])
+
+        data = []
+        for node, dv in good:
+            try:
+                nid = node.nodeid.to_string()
+                data.append({
+                    "name": self._names.get(nid, nid),
+                    "nodeid": nid,
+                    "value": dv.Value.Value,
+                    "source_ts": to_unix(dv.SourceTimestamp),
+                    "server_ts": to_unix(dv.ServerTimestamp),
+                    "received_ts": received,
+                })
+            except Exception:
+                continue
+        return data
+
+    async def read_realtime(self, node_ids: List[str], interval: float = 1.0):
+        """Async generator yielding list of dicts with name, nodeid, value, timestamp every `interval` seconds.
+
+        `timestamp` is the reception time: a polled value that has not changed
+        keeps its old source timestamp, which would store duplicate (node, time)
+        rows. source_ts / server_ts stay in the item for the latency trace.
+        Skips nodes whose value is None or which cannot be read.
+        """
+        try:
+            while True:
+                data = await self.read_values(node_ids)
+                for item in data:
+                    item["timestamp"] = item["received_ts"]
+                yield data
+                await asyncio.sleep(interval)
+        except (GeneratorExit, asyncio.CancelledError):
+            return
+        except Exception:
+            return
+
+    async def subscribe(self, node_ids: List[str], callback: Callable[[Dict], None],
+                        period_ms: int = 1000, queue_size: int = 1) -> Optional[object]:
+        """Create a subscription pushing data changes to `callback(item)`.
+
+        `item` has the same shape as the dicts yielded by read_realtime.
+        Returns the asyncua Subscription, or None on failure.
+        """
+        try:
+            nodes = [self.client.get_node(nid) for nid in node_ids]
+            await asyncio.gather(*(self._name_of(n) for n in nodes))
+            handler = _DataChangeHandler(callback, self._names)
+            sub = await self.client.create_subscription(period_ms, handler)
+            await sub.subscribe_data_change(nodes, queuesize=queue_size)
+            self._subscriptions.append(sub)
+            return sub
+        except Exception as e:
+            print(f"Échec abonnement OPC UA : {e}")
+            return None
@@ -3,6 +3,8 @@ from opcua.ua import NodeClass
 import time
 from typing import List, Dict
 
+from normalizer.opcua_normalizer import to_unix
+
 
 class OPCUAConnector:
     """Generic OPC UA connector using FreeOpcUa (package name: opcua).
@@ -19,6 +21,8 @@ class OPCUAConnector:
         self.username = username
         self.password = password
         self.security = security
+        # nodeid -> browse name, filled by browse_nodes / read_value or primed from a catalog
+        self.names: Dict[str, str] = {}
         self.client = Client(endpoint)
         if username and password:
             self.client.set_user(username)
@@ -63,6 +67,7 @@ class OPCUAConnector:
                 if node_class == NodeClass.Variable:
                     browse_name = child.get_browse_name()
                     name = getattr(browse_name, "Name", str(child.nodeid))
+                    self.names[child.nodeid.to_string()] = name
                     node_info = {
                         "nodeid": child.nodeid.to_string(),
                         "name": name,
@@ -81,23 +86,40 @@ class OPCUAConnector:
     def read_value(self, node_id: str):
         """Read a single node and return a dict with readable name and value.
 
+        The dict also holds source_ts / server_ts (from the DataValue, server
+        clock) and received_ts (local clock), as float UNIX timestamps.
         Returns None on error or if the value is None.
         node_id should be the string form returned by node.nodeid.to_string().
         """
         try:
             node = self.client.get_node(node_id)
-            value = node.get_value()
+            dv = node.get_data_value()
+            received = time.time()
+            value = dv.Value.Value if dv.Value is not None else None
             if value is None:
                 return None
-            browse_name = node.get_browse_name()
-            name = getattr(browse_name, "Name", str(node.nodeid))
-            return {"name": name, "nodeid": node.nodeid.to_string(), "value": value}
+            nid = node.nodeid.to_string()
+            name = self.names.get(nid)
+            if name is None:
+                browse_name = node.get_browse_name()
+                name = self.names[nid] = getattr(browse_name, "Name", str(node.nodeid))
+            return {
+                "name": name,
+                "nodeid": nid,
+                "value": value,
+                "source_ts": to_unix(dv.SourceTimestamp),
+                "server_ts": to_unix(dv.ServerTimestamp),
+                "received_ts": received,
+            }
         except Exception:
             return None
 
     def read_realtime(self, node_ids: List[str], interval: float = 1.0):
         """Generator yielding list of dicts with name, nodeid, value, timestamp every `interval` seconds.
 
+        `timestamp` is the reception time: a polled value that has not changed
+        keeps its old source timestamp, which would store duplicate (node, time)
+        rows. source_ts / server_ts stay in the item for the latency trace.
         Skips nodes whose value is None or which cannot be read.
         """
         try:
@@ -107,7 +129,7 @@ class OPCUAConnector:
                     item = self.read_value(nid)
                     if not item:
                         continue
-                    item["timestamp"] = time.time()
+                    item["timestamp"] = item["received_ts"]
                     data.append(item)
                 yield data
                 time.sleep(interval)
@@ -0,0 +1,120 @@
+# db/migrate.py
+"""Migrations du schéma et vérification des plans de requête.
+
+Exemples (depuis backend/) :
+    python -m db.migrate status
+    python -m db.migrate upgrade            # MySQL, jusqu'à la dernière version
+    python -m db.migrate upgrade --to 3     # garde valeurs numériques et texte dans la même table
+    python -m db.migrate check              # EXPLAIN des requêtes de l'API, code 1 si un index manque
+    python -m db.migrate --sqlite data/ocp_monitor.db check
+    python -m db.migrate bench --rows 200000 --nodes 50
+
+`bench` remplit une base SQLite temporaire, chronomètre les requêtes avant et
+après les index puis vérifie leurs plans.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from db.schema import check_plans, latest_version, schema_version, upgrade
+
+
+def _connect(sqlite_path):
+    if sqlite_path:
+        return sqlite3.connect(sqlite_path)
+    from db.mysql_client import get_connection
+    return get_connection()
+
+
+def _print_checks(results) -> bool:
+    for r in results:
+        print(f"  {'OK ' if r['ok'] else 'KO '} {r['query']} : {r['plan']}")
+    return all(r["ok"] for r in results)
+
+
+def _time_queries(conn, nodes, repeat: int = 20) -> dict:
+    cur = conn.cursor()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for node in nodes:
+            cur.execute("SELECT value, timestamp FROM measurements WHERE node_id = ? "
+                        "ORDER BY timestamp DESC LIMIT 1", (node,))
+            cur.fetchall()
+    latest = (time.perf_counter() - t0) / repeat
+
+    cur.execute("SELECT MAX(timestamp) FROM measurements")
+    end = cur.fetchone()[0]
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        cur.execute("SELECT node_id, value, timestamp FROM measurements WHERE timestamp >= ? AND timestamp < ? "
+                    "ORDER BY timestamp, id", (end - 60, end + 1))
+        cur.fetchall()
+    window = (time.perf_counter() - t0) / repeat
+    return {"latest_per_node_ms": round(latest * 1000, 2), "last_minute_ms": round(window * 1000, 2)}
+
+
+def bench(rows: int, node_count: int):
+    path = os.path.join(tempfile.mkdtemp(prefix="ocp_bench_"), "bench.db")
+    conn = sqlite3.connect(path)
+    try:
+        upgrade(conn, target=1, verbose=False)
+        nodes = [f"ns=2;i={1000 + i}" for i in range(node_count)]
+        start = int(time.time()) - rows // node_count
+        cur = conn.cursor()
+        cur.executemany(
+            "INSERT INTO measurements (source,node_id,name,category,value,unit,timestamp) VALUES (?,?,?,?,?,?,?)",
+            (("opcua", nodes[i % node_count], f"Tag{i % node_count}", "Mesure",
+              repr(random.random() * 100), "", start + i // node_count) for i in range(rows)),
+        )
+        conn.commit()
+        print(f"{rows} mesures, {node_count} nœuds ({path})")
+
+        before = _time_queries(conn, nodes)
+        print(f"  sans index : {before}")
+        upgrade(conn, verbose=False)
+        after = _time_queries(conn, nodes)
+        print(f"  avec index (version {schema_version(conn)}) : {after}")
+        print("Plans de requête :")
+        return _print_checks(check_plans(conn))
+    finally:
+        conn.close()
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrations du schéma OCP Monitor (MySQL par défaut)")
+    parser.add_argument("--sqlite", metavar="PATH", help="base SQLite au lieu de MySQL")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="version courante et dernière version disponible")
+    up = sub.add_parser("upgrade", help="applique les migrations en attente")
+    up.add_argument("--to", type=int, help="version cible (dernière par défaut)")
+    sub.add_parser("check", help="vérifie que les requêtes de l'API utilisent leurs index")
+    b = sub.add_parser("bench", help="banc d'essai SQLite temporaire + vérification des plans")
+    b.add_argument("--rows", type=int, default=200000)
+    b.add_argument("--nodes", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        sys.exit(0 if bench(args.rows, args.nodes) else 1)
+
+    conn = _connect(args.sqlite)
+    try:
+        if args.command == "status":
+            print(f"Schéma en version {schema_version(conn)} (dernière : {latest_version(conn)})")
+        elif args.command == "upgrade":
+            version = upgrade(conn, target=args.to)
+            print(f"Schéma en version {version}")
+        elif args.command == "check":
+            print("Plans de requête :")
+            sys.exit(0 if _print_checks(check_plans(conn)) else 1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
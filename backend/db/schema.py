@@ -0,0 +1,323 @@
+"""Versioned schema for the MySQL and SQLite stores.
+
+Migrations are applied in order and recorded (MySQL: schema_version table,
+SQLite: PRAGMA user_version). They are written to run on databases created
+by hand before the schema was managed: tables are created IF NOT EXISTS and
+an index that already exists is skipped. MySQL commits each DDL statement on
+its own, so a migration interrupted halfway is re-run from its first
+statement: data moves are guarded to be safe to repeat.
+
+MySQL versions:
+    1  nodes / measurements tables
+    2  unique nodes.node_id, (node_id, timestamp) and (timestamp) indexes
+    3  compact column types, millisecond DATETIME(3) timestamps
+    4  text values moved to measurements_text; measurements becomes numeric only
+       and its (node_id, timestamp, value) index covers history queries.
+       Optional: stop at 3 (`upgrade --to 3`) to keep the single-table layout.
+
+SQLite versions:
+    1  measurements / alerts tables
+    2  (node_id, timestamp) and (timestamp) indexes
+"""
+from typing import List, Optional, Tuple, Union
+
+# A statement, or (guard query, statement): the statement only runs if the guard returns a non-zero count
+Statement = Union[str, Tuple[str, str]]
+# (version, description, statements)
+Migration = Tuple[int, str, List[Statement]]
+
+TEXT_SPLIT_VERSION = 4
+
+# measurements.text_value still present: migration 4 has not dropped it yet
+_HAS_TEXT_VALUE = """
+    SELECT COUNT(*) FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'measurements' AND COLUMN_NAME = 'text_value'
+"""
+
+MYSQL_MIGRATIONS: List[Migration] = [
+    (1, "tables nodes / measurements", [
+        """
+        CREATE TABLE IF NOT EXISTS nodes (
+            id INT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            node_id VARCHAR(255) NOT NULL,
+            name VARCHAR(255) NOT NULL DEFAULT '',
+            category VARCHAR(32) NOT NULL DEFAULT '',
+            unit VARCHAR(32) NOT NULL DEFAULT ''
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS measurements (
+            id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            node_id INT UNSIGNED NOT NULL,
+            value DOUBLE NULL,
+            text_value VARCHAR(2000) NULL,
+            timestamp DATETIME NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+    ]),
+    (2, "index nodes.node_id unique, measurements (node_id, timestamp) et (timestamp)", [
+        # doublons créés avant l'index unique : mesures rattachées au plus petit id, puis suppression
+        """
+        UPDATE measurements m
+        JOIN nodes n ON m.node_id = n.id
+        JOIN (SELECT node_id, MIN(id) AS keep_id FROM nodes GROUP BY node_id) k ON k.node_id = n.node_id
+        SET m.node_id = k.keep_id
+        WHERE n.id <> k.keep_id
+        """,
+        """
+        DELETE n FROM nodes n
+        JOIN (SELECT node_id, MIN(id) AS keep_id FROM nodes GROUP BY node_id) k ON k.node_id = n.node_id
+        WHERE n.id <> k.keep_id
+        """,
+        "ALTER TABLE nodes ADD UNIQUE INDEX ux_nodes_node_id (node_id)",
+        "ALTER TABLE measurements ADD INDEX ix_measurements_node_ts (node_id, timestamp)",
+        "ALTER TABLE measurements ADD INDEX ix_measurements_ts (timestamp)",
+    ]),
+    (3, "types compacts, horodatage à la milliseconde", [
+        """
+        ALTER TABLE nodes
+            MODIFY id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+            MODIFY category VARCHAR(32) NOT NULL DEFAULT '',
+            MODIFY unit VARCHAR(32) NOT NULL DEFAULT ''
+        """,
+        """
+        ALTER TABLE measurements
+            MODIFY node_id INT UNSIGNED NOT NULL,
+            MODIFY value DOUBLE NULL,
+            MODIFY timestamp DATETIME(3) NOT NULL
+        """,
+    ]),
+    (TEXT_SPLIT_VERSION, "valeurs texte dans measurements_text, index couvrant sur measurements", [
+        """
+        CREATE TABLE IF NOT EXISTS measurements_text (
+            id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            node_id INT UNSIGNED NOT NULL,
+            text_value VARCHAR(2000) NOT NULL,
+            timestamp DATETIME(3) NOT NULL,
+            INDEX ix_measurements_text_node_ts (node_id, timestamp),
+            INDEX ix_measurements_text_ts (timestamp)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+        # rows already copied by an interrupted run (stopped before the DELETE) are not copied again
+        (_HAS_TEXT_VALUE, """
+        INSERT INTO measurements_text (node_id, text_value, timestamp)
+        SELECT m.node_id, m.text_value, m.timestamp FROM measurements m
+        WHERE m.text_value IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM measurements_text t
+            WHERE t.node_id = m.node_id AND t.timestamp = m.timestamp AND t.text_value = m.text_value
+        )
+        """),
+        (_HAS_TEXT_VALUE, "DELETE FROM measurements WHERE text_value IS NOT NULL"),
+        (_HAS_TEXT_VALUE, """
+        ALTER TABLE measurements
+            DROP COLUMN text_value,
+            DROP INDEX ix_measurements_node_ts,
+            ADD INDEX ix_measurements_node_ts_value (node_id, timestamp, value)
+        """),
+    ]),
+]
+
+SQLITE_MIGRATIONS: List[Migration] = [
+    (1, "tables measurements / alerts", [
+        """
+        CREATE TABLE IF NOT EXISTS measurements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT,
+            node_id TEXT,
+            name TEXT,
+            category TEXT,
+            value TEXT,
+            unit TEXT,
+            timestamp INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            node_id TEXT,
+            severity TEXT,
+            message TEXT,
+            value REAL,
+            threshold REAL,
+            timestamp INTEGER
+        )
+        """,
+    ]),
+    (2, "index measurements (node_id, timestamp) et (timestamp)", [
+        "CREATE INDEX IF NOT EXISTS ix_measurements_node_ts ON measurements (node_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_measurements_ts ON measurements (timestamp)",
+    ]),
+]
+
+# MySQL error raised when an index / column to add already exists
+_MYSQL_ALREADY_EXISTS = (1060, 1061)
+# Unknown column / unknown table: the layout changed under a running process
+_MYSQL_LAYOUT_CHANGED = (1054, 1146)
+
+_text_split: Optional[bool] = None
+
+
+def _is_sqlite(conn) -> bool:
+    return type(conn).__module__.startswith("sqlite3")
+
+
+def migrations_for(conn) -> List[Migration]:
+    return SQLITE_MIGRATIONS if _is_sqlite(conn) else MYSQL_MIGRATIONS
+
+
+def schema_version(conn) -> int:
+    cur = conn.cursor()
+    try:
+        if _is_sqlite(conn):
+            cur.execute("PRAGMA user_version")
+            return cur.fetchone()[0]
+        cur.execute("SHOW TABLES LIKE 'schema_version'")
+        if not cur.fetchall():
+            return 0
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        return int(cur.fetchone()[0])
+    finally:
+        cur.close()
+
+
+def latest_version(conn) -> int:
+    return migrations_for(conn)[-1][0]
+
+
+def _run(cur, statement: Statement, sqlite: bool):
+    if isinstance(statement, tuple):
+        guard, statement = statement
+        cur.execute(guard)
+        if not cur.fetchone()[0]:
+            return
+    try:
+        cur.execute(statement)
+    except Exception as e:
+        if not sqlite and getattr(e, "errno", None) in _MYSQL_ALREADY_EXISTS:
+            return
+        raise
+
+
+def upgrade(conn, target: Optional[int] = None, verbose: bool = True) -> int:
+    """Apply pending migrations up to `target` (latest by default); returns the new version."""
+    sqlite = _is_sqlite(conn)
+    current = schema_version(conn)
+    cur = conn.cursor()
+    try:
+        if not sqlite:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT UNSIGNED NOT NULL PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        for version, description, statements in migrations_for(conn):
+            if version <= current or (target is not None and version > target):
+                continue
+            if verbose:
+                print(f"Migration {version} : {description}")
+            for statement in statements:
+                _run(cur, statement, sqlite)
+            if sqlite:
+                cur.execute(f"PRAGMA user_version = {int(version)}")
+            else:
+                cur.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                            (version, description))
+            conn.commit()
+            current = version
+    finally:
+        cur.close()
+    return current
+
+
+def text_split_enabled(conn) -> bool:
+    """True once the MySQL schema stores text values in measurements_text."""
+    return not _is_sqlite(conn) and schema_version(conn) >= TEXT_SPLIT_VERSION
+
+
+def text_split(conn) -> bool:
+    """text_split_enabled(), read once per process and cached.
+
+    Migration 4 may run while the collector or the API is up: callers pass
+    query errors to layout_changed(), which clears the cache so the next
+    call detects the layout again.
+    """
+    global _text_split
+    if _text_split is None:
+        _text_split = text_split_enabled(conn)
+    return _text_split
+
+
+def layout_changed(error: Exception) -> bool:
+    """True (and cached layout forgotten) if `error` is an unknown column / table error."""
+    global _text_split
+    if getattr(error, "errno", None) in _MYSQL_LAYOUT_CHANGED:
+        _text_split = None
+        return True
+    return False
+
+
+# Representative queries and the index each must use without sorting.
+# (name, sql, params, accepted indexes, must be covering)
+MYSQL_PLAN_CHECKS = [
+    ("dernière mesure d'un nœud",
+     "SELECT id, timestamp FROM measurements WHERE node_id = %s ORDER BY timestamp DESC LIMIT 1",
+     (1,), ("ix_measurements_node_ts", "ix_measurements_node_ts_value"), True),
+    ("historique d'un nœud",
+     "SELECT id, value, timestamp FROM measurements WHERE node_id = %s ORDER BY timestamp DESC LIMIT 100",
+     (1,), ("ix_measurements_node_ts_value",), True),
+    ("plage temporelle d'un nœud",
+     "SELECT id, value, timestamp FROM measurements WHERE node_id = %s "
+     "AND timestamp >= NOW() - INTERVAL 1 DAY ORDER BY timestamp",
+     (1,), ("ix_measurements_node_ts", "ix_measurements_node_ts_value"), False),
+    ("dernières mesures globales",
+     "SELECT id, node_id, timestamp FROM measurements ORDER BY timestamp DESC LIMIT 50",
+     (), ("ix_measurements_ts",), False),
+    ("recherche d'un nœud",
+     "SELECT id FROM nodes WHERE node_id = %s",
+     ("ns=0;i=2258",), ("ux_nodes_node_id",), True),
+]
+
+SQLITE_PLAN_CHECKS = [
+    ("dernière mesure d'un nœud",
+     "SELECT timestamp FROM measurements WHERE node_id = ? ORDER BY timestamp DESC LIMIT 1",
+     ("ns=0;i=2258",), ("ix_measurements_node_ts",), True),
+    ("plage temporelle",
+     "SELECT node_id, value, timestamp FROM measurements WHERE timestamp >= ? AND timestamp < ? "
+     "ORDER BY timestamp, id",
+     (0, 2 ** 31), ("ix_measurements_ts",), False),
+]
+
+
+def check_plans(conn) -> List[dict]:
+    """EXPLAIN the representative queries; each result has ok = right index, no sort, covering if required."""
+    sqlite = _is_sqlite(conn)
+    checks = SQLITE_PLAN_CHECKS if sqlite else MYSQL_PLAN_CHECKS
+    if not sqlite and not text_split_enabled(conn):
+        # sans la migration 4, l'historique ne peut pas être couvert par un index
+        checks = [(n, q, p, idx + ("ix_measurements_node_ts",), False) if n == "historique d'un nœud"
+                  else (n, q, p, idx, cov) for n, q, p, idx, cov in checks]
+
+    results = []
+    cur = conn.cursor()
+    try:
+        for name, sql, params, indexes, covering in checks:
+            if sqlite:
+                cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+                plan = " | ".join(row[-1] for row in cur.fetchall())
+                used = next((i for i in indexes if f"INDEX {i} " in plan + " "), None)
+                ok = bool(used) and "TEMP B-TREE" not in plan and (not covering or "COVERING INDEX" in plan)
+            else:
+                cur.execute("EXPLAIN " + sql, params)
+                columns = [d[0] for d in cur.description]
+                row = dict(zip(columns, cur.fetchone()))
+                plan = f"key={row.get('key')} extra={row.get('Extra')}"
+                extra = row.get("Extra") or ""
+                used = row.get("key") if row.get("key") in indexes else None
+                ok = bool(used) and "filesort" not in extra and (not covering or "Using index" in extra)
+            results.append({"query": name, "ok": ok, "plan": plan})
+    finally:
+        cur.close()
+    return results
@@ -1,7 +1,11 @@
-def detect_anomaly(current_value, stats) -> bool:
+# Relative deviation from the rolling average considered anomalous
+ANOMALY_THRESHOLD = 0.3
+
+
+def detect_anomaly(current_value, stats, threshold=None) -> bool:
     """Simple anomaly detection based on relative deviation from rolling average.
 
-    Returns True when deviation > 30%.
+    Returns True when deviation > threshold (ANOMALY_THRESHOLD, 30%, by default).
     """
     if not stats:
         return False
@@ -16,4 +20,4 @@ def detect_anomaly(current_value, stats) -> bool:
         return False
 
     deviation = abs(cur - avg) / avg
-    return deviation > 0.3
+    return deviation > (ANOMALY_THRESHOLD if threshold is None else threshold)
@@ -0,0 +1,189 @@
+import math
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from models.alert_model import Alert
+
+SLOW_ALPHA = 0.01    # EWMA weight of the baseline (long-term) statistics, lowered for large groups
+FAST_ALPHA = 0.1     # EWMA weight of the recent (short-term) statistics
+WARMUP_TICKS = 50    # no alert before the baseline has seen this many ticks
+MIN_BASELINE_CORR = 0.7   # only pairs with an established relationship are watched
+BREAK_DELTA = 0.5         # |fast corr - baseline corr| above this is a break
+OUTLIER_Z = 3.09          # ~ p = 0.999 for the chi-square threshold
+OUTLIER_TICKS = 3         # consecutive ticks above (then below) the threshold to raise (then clear) an outlier
+INVERSE_EVERY = 25        # ticks between covariance pseudo-inverse refreshes
+
+
+def chi2_threshold(df: int, z: float = OUTLIER_Z) -> float:
+    """Wilson-Hilferty approximation of the chi-square quantile (no scipy needed)."""
+    k = 2.0 / (9.0 * df)
+    return df * (1.0 - k + z * math.sqrt(k)) ** 3
+
+
+def _corr(cov: np.ndarray) -> np.ndarray:
+    std = np.sqrt(np.clip(np.diag(cov), 1e-12, None))
+    return cov / np.outer(std, std)
+
+
+class _GroupState:
+    def __init__(self, name: str, tags: List[str]):
+        n = len(tags)
+        self.name = name
+        self.tags = tags
+        self.index = {tag: i for i, tag in enumerate(tags)}
+        self.last = np.full(n, np.nan)
+        self.ticks = 0
+        self.mean_slow = np.zeros(n)
+        self.cov_slow = np.zeros((n, n))
+        self.m4_slow = np.zeros((n, n))   # EWMA of (d_i d_j)^2, for the Ledoit-Wolf shrinkage
+        self.weight2 = 1.0                # sum of squared EWMA weights (1 / effective sample size)
+        self.mean_fast = np.zeros(n)
+        self.cov_fast = np.zeros((n, n))
+        self.inv_cov: Optional[np.ndarray] = None
+        self.broken = np.zeros((n, n), dtype=bool)
+        self.threshold = chi2_threshold(n)
+        self.shrinkage = 1.0
+        self.distance = 0.0
+        self.above = 0       # consecutive ticks above / below the outlier threshold
+        self.below = 0
+        self.outlier = False  # latched until OUTLIER_TICKS ticks back below the threshold
+        # an n x n covariance estimate needs many more ticks than tags to be meaningful:
+        # warm-up and baseline memory (~2 / alpha ticks) grow with the group size
+        self.warmup = max(WARMUP_TICKS, 5 * n)
+        self.slow_alpha = min(SLOW_ALPHA, 1.0 / (10 * n))
+
+
+def _ewm_update(mean: np.ndarray, cov: np.ndarray, x: np.ndarray, alpha: float,
+                m4: Optional[np.ndarray] = None):
+    """In-place exponentially weighted mean/covariance (and 4th moment) update, O(n^2)."""
+    d = x - mean
+    mean += alpha * d
+    outer = np.outer(d, d)
+    cov *= (1.0 - alpha)
+    cov += (alpha * (1.0 - alpha)) * outer
+    if m4 is not None:
+        m4 *= (1.0 - alpha)
+        m4 += alpha * outer * outer
+
+
+def _shrinkage(cov: np.ndarray, m4: np.ndarray, weight2: float) -> float:
+    """Ledoit-Wolf intensity towards the diagonal: estimation variance of the
+    off-diagonal covariances over their squared size (1 = independent tags)."""
+    off = ~np.eye(len(cov), dtype=bool)
+    variance = weight2 * float(np.clip(m4 - cov * cov, 0.0, None)[off].sum())
+    size = float((cov * cov)[off].sum())
+    if size <= 0.0:
+        return 1.0
+    return min(1.0, variance / size)
+
+
+class CorrelationEngine:
+    """Streaming multivariate detector over configurable groups of tags.
+
+    For each group, baseline and recent covariance matrices are updated
+    incrementally on every tick (O(n^2) per group, vectorized). It flags:
+    - correlation breaks: a strongly correlated pair whose recent correlation
+      drifts away from the baseline (alert once when the break appears)
+    - Mahalanobis outliers: distance to the baseline above the chi-square
+      threshold for the group size during OUTLIER_TICKS consecutive ticks
+      (alert once, cleared after OUTLIER_TICKS ticks back below)
+
+    The baseline covariance is shrunk towards its diagonal with a Ledoit-Wolf
+    intensity, so the distance keeps its nominal false-alarm rate for groups
+    of hundreds of tags.
+
+    Tags missing from a tick keep their last value; a group starts once all
+    of its tags have been seen.
+    """
+
+    def __init__(self, groups: Dict[str, List[str]]):
+        self.groups = [_GroupState(name, tags) for name, tags in groups.items() if len(tags) >= 2]
+
+    def update(self, values: Dict[str, float], timestamp: Optional[int] = None) -> List[Alert]:
+        """Feed one tick ({tag key: numeric value}) and return the alerts raised."""
+        timestamp = timestamp or int(time.time())
+        alerts: List[Alert] = []
+        for group in self.groups:
+            for tag, value in values.items():
+                i = group.index.get(tag)
+                if i is not None:
+                    group.last[i] = value
+            if np.isnan(group.last).any():
+                continue
+            alerts.extend(self._update_group(group, timestamp))
+        return alerts
+
+    def _update_group(self, group: _GroupState, timestamp: int) -> List[Alert]:
+        x = group.last
+        if group.ticks == 0:
+            group.mean_slow[:] = x
+            group.mean_fast[:] = x
+            group.ticks = 1
+            return []
+
+        alerts = []
+        warm = group.ticks >= group.warmup
+
+        # Mahalanobis distance against the baseline, before it absorbs x
+        if warm:
+            if group.inv_cov is None or group.ticks % INVERSE_EVERY == 0:
+                group.shrinkage = _shrinkage(group.cov_slow, group.m4_slow, group.weight2)
+                cov = (1.0 - group.shrinkage) * group.cov_slow
+                cov[np.diag_indices_from(cov)] += group.shrinkage * np.diag(group.cov_slow) + 1e-9
+                group.inv_cov = np.linalg.pinv(cov, hermitian=True)
+                # distances to an estimated covariance are inflated by ~ m / (m - p - 1)
+                # (m effective samples, p unshrunk dimensions): scale them back
+                samples = 1.0 / group.weight2
+                dims = (1.0 - group.shrinkage) * len(x)
+                group.inv_cov *= max(samples - dims - 1.0, 1.0) / samples
+            d = x - group.mean_slow
+            contrib = d * (group.inv_cov @ d)
+            distance = group.distance = float(contrib.sum())
+            if distance > group.threshold:
+                group.above, group.below = group.above + 1, 0
+            else:
+                group.above, group.below = 0, group.below + 1
+            if group.outlier and group.below >= OUTLIER_TICKS:
+                group.outlier = False
+            if not group.outlier and group.above >= OUTLIER_TICKS:
+                group.outlier = True
+                top = group.tags[int(np.argmax(contrib))]
+                alerts.append(Alert(
+                    name=group.name,
+                    node_id=top,
+                    severity="WARNING",
+                    message=f"Comportement anormal du groupe {group.name} (principal contributeur : {top})",
+                    value=distance,
+                    threshold=group.threshold,
+                    timestamp=timestamp,
+                ))
+
+        # 1/t until the EWMA weight takes over: plain averages during warm-up, no zero bias
+        group.ticks += 1
+        alpha = max(group.slow_alpha, 1.0 / group.ticks)
+        _ewm_update(group.mean_slow, group.cov_slow, x, alpha, group.m4_slow)
+        group.weight2 = (1.0 - alpha) ** 2 * group.weight2 + alpha ** 2
+        _ewm_update(group.mean_fast, group.cov_fast, x, max(FAST_ALPHA, 1.0 / group.ticks))
+
+        if warm:
+            slow = _corr(group.cov_slow)
+            fast = _corr(group.cov_fast)
+            broken = (np.abs(slow) >= MIN_BASELINE_CORR) & (np.abs(fast - slow) > BREAK_DELTA)
+            np.fill_diagonal(broken, False)
+            new = np.argwhere(np.triu(broken & ~group.broken))
+            group.broken = broken
+            for i, j in new:
+                a, b = group.tags[i], group.tags[j]
+                alerts.append(Alert(
+                    name=group.name,
+                    node_id=f"{a}|{b}",
+                    severity="WARNING",
+                    message=f"Rupture de corrélation entre {a} et {b}",
+                    value=float(fast[i, j]),
+                    threshold=float(slow[i, j]),
+                    timestamp=timestamp,
+                ))
+
+        return alerts
@@ -0,0 +1,188 @@
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from models.alert_model import Alert
+from intelligence.rules_engine import THRESHOLDS
+from intelligence.stats_engine import WINDOW_SIZE
+
+HORIZON = 300.0        # seconds: early-warning when a threshold is predicted within this delay
+CLEAR_FACTOR = 2.0     # an early warning is re-armed once the prediction stays beyond CLEAR_FACTOR x horizon
+INITIAL_CAPACITY = 256  # tags, doubled when exceeded
+
+
+def _fit(times: np.ndarray, values: np.ndarray, now: float):
+    """Batched least-squares line per row, ignoring NaN slots.
+
+    Returns (level at `now`, slope per second, sample count), one entry per row.
+    """
+    mask = ~np.isnan(values)
+    n = mask.sum(axis=1)
+    safe_n = np.maximum(n, 1)
+    t = np.where(mask, times - now, 0.0)
+    v = np.where(mask, values, 0.0)
+    t_mean = t.sum(axis=1) / safe_n
+    v_mean = v.sum(axis=1) / safe_n
+    dt = np.where(mask, t - t_mean[:, None], 0.0)
+    dv = np.where(mask, v - v_mean[:, None], 0.0)
+    denom = (dt * dt).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denom > 0, (dt * dv).sum(axis=1) / denom, 0.0)
+    level = v_mean - slope * t_mean
+    return level, slope, n
+
+
+def _time_to(level: np.ndarray, slope: np.ndarray, threshold: np.ndarray) -> np.ndarray:
+    """Seconds until `level` reaches `threshold` at `slope` (0 if already there, inf if never)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eta = np.where(slope > 0, (threshold - level) / slope, np.inf)
+    eta = np.where(level >= threshold, 0.0, eta)
+    return np.where(np.isnan(threshold), np.inf, eta)
+
+
+def _thresholds(name: str, thresholds: Optional[Dict] = None):
+    limits = (THRESHOLDS if thresholds is None else thresholds).get(name, {})
+    return limits.get("warning", np.nan), limits.get("critical", np.nan)
+
+
+def _finite(x: float) -> Optional[float]:
+    return float(x) if np.isfinite(x) else None
+
+
+def forecast_series(name: str, timestamps: List[float], values: List[float], now: Optional[float] = None) -> Dict:
+    """Trend and time-to-threshold for a single series (used by the /forecast endpoint)."""
+    now = now if now is not None else time.time()
+    times = np.asarray([timestamps], dtype=float)
+    vals = np.asarray([values], dtype=float)
+    level, slope, n = _fit(times, vals, now)
+    warning, critical = _thresholds(name)
+    return {
+        "name": name,
+        "samples": int(n[0]),
+        "level": _finite(level[0]) if n[0] else None,
+        "slope_per_s": float(slope[0]),
+        "warning": _finite(warning),
+        "critical": _finite(critical),
+        "time_to_warning_s": _finite(_time_to(level, slope, np.array([warning]))[0]) if n[0] else None,
+        "time_to_critical_s": _finite(_time_to(level, slope, np.array([critical]))[0]) if n[0] else None,
+    }
+
+
+class ForecastEngine:
+    """Rolling linear trend per tag over the stats window, computed for all tags at once.
+
+    Samples are kept in (tags x window) NumPy ring buffers; each tick refits
+    every tag with one batched least-squares pass and estimates the time left
+    before the THRESHOLDS warning / critical limits. An early-warning alert is
+    raised once when a limit is predicted within `horizon` seconds. It stays
+    latched while the level is at or above the limit, and is only re-armed once
+    the prediction has stayed beyond CLEAR_FACTOR x horizon for a full window
+    of ticks (the 10-sample slope is noisy and flips often).
+    """
+
+    def __init__(self, window: int = WINDOW_SIZE, horizon: float = HORIZON, thresholds: Optional[Dict] = None):
+        self.window = window
+        self.horizon = horizon
+        self.thresholds = thresholds
+        self.index: Dict[str, int] = {}
+        self.node_ids: List[str] = []
+        self.names: List[str] = []
+        self._allocate(INITIAL_CAPACITY)
+
+    def _allocate(self, capacity: int):
+        old = len(self.node_ids)
+        values = np.full((capacity, self.window), np.nan)
+        times = np.full((capacity, self.window), np.nan)
+        counts = np.zeros(capacity, dtype=np.int64)
+        warning = np.full(capacity, np.nan)
+        critical = np.full(capacity, np.nan)
+        alerted = np.zeros((capacity, 2), dtype=bool)
+        calm = np.zeros((capacity, 2), dtype=np.int64)  # consecutive ticks beyond the clear horizon
+        if old:
+            values[:old] = self.values[:old]
+            times[:old] = self.times[:old]
+            counts[:old] = self.counts[:old]
+            warning[:old] = self.warning[:old]
+            critical[:old] = self.critical[:old]
+            alerted[:old] = self.alerted[:old]
+            calm[:old] = self.calm[:old]
+        self.values, self.times, self.counts = values, times, counts
+        self.warning, self.critical, self.alerted, self.calm = warning, critical, alerted, calm
+
+    def _row(self, node_id: str, name: str) -> int:
+        row = self.index.get(node_id)
+        if row is None:
+            row = len(self.node_ids)
+            if row >= len(self.counts):
+                self._allocate(2 * len(self.counts))
+            self.index[node_id] = row
+            self.node_ids.append(node_id)
+            self.names.append(name)
+            self.warning[row], self.critical[row] = _thresholds(name, self.thresholds)
+        return row
+
+    def update(self, batch, now: Optional[float] = None) -> List[Alert]:
+        """Add a batch of NormalizedData and return the early-warning alerts raised."""
+        now = now if now is not None else time.time()
+        rows, offsets, values, stamps = [], [], [], []
+        seen: Dict[int, int] = {}
+        for data in batch:
+            try:
+                value = float(data.value)
+            except Exception:
+                continue
+            row = self._row(data.node_id, data.name)
+            # several samples of the same tag in one batch go to consecutive slots
+            offsets.append(seen.get(row, 0))
+            seen[row] = offsets[-1] + 1
+            rows.append(row)
+            values.append(value)
+            stamps.append(float(data.timestamp))
+        if not rows:
+            return []
+
+        rows = np.asarray(rows)
+        cols = (self.counts[rows] + np.asarray(offsets)) % self.window
+        self.values[rows, cols] = values
+        self.times[rows, cols] = stamps
+        np.add.at(self.counts, rows, 1)
+
+        size = len(self.node_ids)
+        level, slope, n = _fit(self.times[:size], self.values[:size], now)
+        ready = n >= 3
+        eta = np.stack([
+            _time_to(level, slope, self.warning[:size]),
+            _time_to(level, slope, self.critical[:size]),
+        ], axis=1)
+        predicted = ready[:, None] & (eta > 0) & (eta <= self.horizon)
+        # eta == 0 (level at or above the limit) also holds the latch
+        held = ready[:, None] & (eta <= CLEAR_FACTOR * self.horizon)
+        calm = self.calm[:size]
+        calm[:] = np.where(held, 0, calm + 1)
+
+        alerts = []
+        for row, col in np.argwhere(predicted & ~self.alerted[:size]):
+            limit = "WARNING" if col == 0 else "CRITICAL"
+            threshold = self.warning[row] if col == 0 else self.critical[row]
+            name = self.names[row]
+            alerts.append(Alert(
+                name=name,
+                node_id=self.node_ids[row],
+                severity="INFO" if col == 0 else "WARNING",
+                message=f"{name} devrait atteindre le seuil {limit} dans {eta[row, col]:.0f} s",
+                value=float(level[row]),
+                threshold=float(threshold),
+                timestamp=int(now),
+            ))
+        self.alerted[:size] = (self.alerted[:size] | predicted) & (calm < self.window)
+        return alerts
+
+    def forecast(self, node_id: str, now: Optional[float] = None) -> Optional[Dict]:
+        """Current trend for one tag, or None if it has never been seen."""
+        row = self.index.get(node_id)
+        if row is None:
+            return None
+        result = forecast_series(self.names[row], self.times[row].tolist(), self.values[row].tolist(), now)
+        result["node_id"] = node_id
+        return result
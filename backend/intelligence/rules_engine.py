@@ -1,5 +1,6 @@
+import copy
 import time
-from typing import List
+from typing import Dict, List, Optional
 from models.alert_model import Alert
 
 # Seuils configurables (extension possible via JSON / UI)
@@ -9,11 +10,23 @@ THRESHOLDS = {
 }
 
 
-def evaluate_rules(normalized_data) -> List[Alert]:
+def merge_thresholds(overrides: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, Dict[str, float]]:
+    """Copy of THRESHOLDS with per-name overrides, e.g. {"Temperature": {"warning": 55}}."""
+    thresholds = copy.deepcopy(THRESHOLDS)
+    for name, limits in (overrides or {}).items():
+        thresholds.setdefault(name, {}).update(limits)
+    return thresholds
+
+
+def evaluate_rules(normalized_data, thresholds: Optional[Dict[str, Dict[str, float]]] = None) -> List[Alert]:
     """Evaluate threshold rules on a NormalizedData object and return a list of Alert(s).
 
+    `thresholds` defaults to the module THRESHOLDS.
     Returns an empty list when the value is OK or not numeric / not configured.
     """
+    if thresholds is None:
+        thresholds = THRESHOLDS
+
     alerts: List[Alert] = []
 
     name = normalized_data.name
@@ -25,17 +38,17 @@ def evaluate_rules(normalized_data) -> List[Alert]:
     except Exception:
         return alerts
 
-    if name not in THRESHOLDS:
+    if name not in thresholds:
         return alerts
 
-    thresholds = THRESHOLDS[name]
+    limits = thresholds[name]
 
-    if value >= thresholds.get("critical", float("inf")):
+    if value >= limits.get("critical", float("inf")):
         severity = "CRITICAL"
-        threshold = thresholds.get("critical")
-    elif value >= thresholds.get("warning", float("inf")):
+        threshold = limits.get("critical")
+    elif value >= limits.get("warning", float("inf")):
         severity = "WARNING"
-        threshold = thresholds.get("warning")
+        threshold = limits.get("warning")
     else:
         return alerts
 
@@ -47,7 +60,7 @@ def evaluate_rules(normalized_data) -> List[Alert]:
             message=f"{name} dépasse le seuil {severity}",
             value=value,
             threshold=threshold,
-            timestamp=int(time.time()),
+            timestamp=int(normalized_data.timestamp or time.time()),
         )
     )
 
@@ -0,0 +1,338 @@
+import multiprocessing as mp
+import os
+import zlib
+from collections.abc import Sequence
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.alert_model import Alert
+from models.data_model import NormalizedData
+from intelligence.stats_engine import StatsEngine
+import intelligence.anomaly_engine as anomaly_engine
+from intelligence.anomaly_engine import detect_anomaly
+from intelligence.rules_engine import THRESHOLDS, evaluate_rules
+
+# Shared memory layout, one float64 column per field
+IN_FIELDS = 3    # tag index, value, timestamp
+OUT_FIELDS = 5   # avg, min, max, count, anomaly flag
+DEFAULT_CAPACITY = 4096  # samples per batch and per shard
+
+
+def shard_of(node_id: str, shards: int) -> int:
+    """Stable shard index for a node id (same result in every process)."""
+    return zlib.crc32(node_id.encode("utf-8")) % shards
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return float("nan")
+
+
+def _to_floats(raw_values: list) -> np.ndarray:
+    """float64 column of a batch's values, NaN where float() fails (the workers skip NaN)."""
+    try:
+        # None becomes NaN, numeric strings are parsed
+        values = np.asarray(raw_values, dtype=np.float64)
+        if values.shape == (len(raw_values),):
+            return values
+    except (TypeError, ValueError):
+        pass
+    # Text values (server status, dates...) or lists in the batch
+    return np.fromiter((_to_float(v) for v in raw_values), dtype=np.float64, count=len(raw_values))
+
+
+def _worker_main(conn, in_name: str, out_name: str, capacity: int,
+                 thresholds: Dict[str, Dict[str, float]], anomaly_threshold: float):
+    """Worker process loop: owns stats, detector and rule state for one shard.
+
+    Rule thresholds and the anomaly ratio are passed explicitly: under the
+    spawn / forkserver start methods the worker re-imports the engines and
+    would not see values changed at runtime in the parent's modules.
+
+    Samples arrive as columns in the `in` shared memory block; only the batch
+    length and new tag registrations go through the pipe. Stats are written
+    back as columns of the `out` block, alerts (rare) through the pipe.
+    """
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    samples = np.ndarray((IN_FIELDS, capacity), dtype=np.float64, buffer=shm_in.buf)
+    results = np.ndarray((OUT_FIELDS, capacity), dtype=np.float64, buffer=shm_out.buf)
+
+    stats_engine = StatsEngine()
+    # One NormalizedData per tag, updated in place: the engines keep no reference to it
+    tags: Dict[int, NormalizedData] = {}
+
+    try:
+        while True:
+            msg = conn.recv()
+            kind = msg[0]
+            if kind == "stop":
+                break
+            if kind == "register":
+                for idx, node_id, name, category, unit in msg[1]:
+                    tags[idx] = NormalizedData("opcua", node_id, name, category, None, unit, 0.0)
+                continue
+            if kind != "batch":
+                continue
+
+            n = msg[1]
+            indexes = samples[0, :n].astype(np.int64).tolist()
+            values = samples[1, :n].tolist()
+            timestamps = samples[2, :n].tolist()
+            avgs, mins, maxs, counts, anomalies = [0.0] * n, [0.0] * n, [0.0] * n, [0.0] * n, [0.0] * n
+            alerts = []
+            for i in range(n):
+                value = values[i]
+                if value != value:  # NaN: not a numeric reading
+                    continue
+                data = tags[indexes[i]]
+                data.value = value
+                data.timestamp = timestamps[i]
+
+                stats = stats_engine.update(data)
+                if stats:
+                    avgs[i], mins[i], maxs[i] = stats["avg"], stats["min"], stats["max"]
+                    counts[i] = stats["count"]
+                    anomalies[i] = 1.0 if detect_anomaly(value, stats, anomaly_threshold) else 0.0
+
+                if data.name in thresholds:
+                    for alert in evaluate_rules(data, thresholds):
+                        alerts.append((i, alert))
+
+            results[:, :n] = (avgs, mins, maxs, counts, anomalies)
+            conn.send(alerts)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del samples, results
+        shm_in.close()
+        shm_out.close()
+
+
+class _Shard:
+    def __init__(self, capacity: int, thresholds: Dict[str, Dict[str, float]], anomaly_threshold: float):
+        size = capacity * 8
+        self.shm_in = shared_memory.SharedMemory(create=True, size=size * IN_FIELDS)
+        self.shm_out = shared_memory.SharedMemory(create=True, size=size * OUT_FIELDS)
+        self.samples = np.ndarray((IN_FIELDS, capacity), dtype=np.float64, buffer=self.shm_in.buf)
+        self.results = np.ndarray((OUT_FIELDS, capacity), dtype=np.float64, buffer=self.shm_out.buf)
+        self.conn, child_conn = mp.Pipe()
+        self.process = mp.Process(
+            target=_worker_main,
+            args=(child_conn, self.shm_in.name, self.shm_out.name, capacity, thresholds, anomaly_threshold),
+            daemon=True,
+        )
+        self.new_tags: List[Tuple[int, str, str, str, Optional[str]]] = []
+
+    def close(self):
+        try:
+            self.conn.send(("stop",))
+        except Exception:
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+        del self.samples, self.results
+        for shm in (self.shm_in, self.shm_out):
+            shm.close()
+            shm.unlink()
+
+
+class BatchResults(Sequence):
+    """Columnar results of ShardedAnalytics.process_batch.
+
+    Behaves like the list of {"data", "stats", "anomaly", "alerts"} dicts
+    returned by the inline path, but each dict is only built when indexed.
+    Bulk consumers read the columns directly: `stats` (OUT_FIELDS x n array,
+    count 0 = no stats), `anomaly` (bool array) and `alerts` {position: [Alert]}.
+    """
+
+    def __init__(self, batch: List[NormalizedData], stats: np.ndarray, alerts: Dict[int, List[Alert]]):
+        self.batch = batch
+        self.stats = stats
+        self.anomaly = stats[4] != 0.0
+        self.alerts = alerts
+
+    def __len__(self):
+        return len(self.batch)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        avg, mn, mx, count, anomaly = self.stats[:, i].tolist()
+        return {
+            "data": self.batch[i],
+            "stats": {"avg": avg, "min": mn, "max": mx, "count": int(count)} if count else None,
+            "anomaly": bool(anomaly),
+            "alerts": self.alerts.get(i, []),
+        }
+
+    def all_alerts(self) -> List[Alert]:
+        return [alert for pos in sorted(self.alerts) for alert in self.alerts[pos]]
+
+
+class ShardedAnalytics:
+    """Analytics tier partitioning tags by hash of node_id across worker processes.
+
+    Each worker runs StatsEngine, detect_anomaly and evaluate_rules for its own
+    shard, so analytics throughput scales with the number of cores. The parent
+    only does bulk work: one dict lookup per sample to get the tag index, then
+    array scatter / gather through the shared memory columns. Values are
+    converted to float64 in the parent (one numpy call, or one float() per
+    sample when the batch mixes in strings / lists); non-numeric values become
+    NaN and have no stats or rules, as on the inline path.
+
+    process_batch() returns a BatchResults, a sequence of
+    {"data": NormalizedData, "stats": dict | None, "anomaly": bool, "alerts": [Alert]}.
+    """
+
+    def __init__(self, workers: Optional[int] = None, capacity: int = DEFAULT_CAPACITY,
+                 thresholds: Optional[Dict[str, Dict[str, float]]] = None,
+                 anomaly_threshold: Optional[float] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = capacity
+        self.thresholds = THRESHOLDS if thresholds is None else thresholds
+        self.anomaly_threshold = anomaly_engine.ANOMALY_THRESHOLD if anomaly_threshold is None else anomaly_threshold
+        self.shards: List[_Shard] = []
+        self.tag_index: Dict[str, int] = {}
+        self.tag_shard = np.zeros(0, dtype=np.int64)  # tag index -> shard
+
+    def start(self):
+        for _ in range(self.workers):
+            shard = _Shard(self.capacity, self.thresholds, self.anomaly_threshold)
+            shard.process.start()
+            self.shards.append(shard)
+        print(f"Analytics : {self.workers} workers démarrés")
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self.shards = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _register(self, batch: List[NormalizedData], node_ids: List[str]) -> np.ndarray:
+        """Tag index of every sample, registering tags seen for the first time."""
+        get = self.tag_index.get
+        indexes = [get(nid, -1) for nid in node_ids]
+        if -1 in indexes:
+            shards = []
+            for pos, idx in enumerate(indexes):
+                if idx != -1:
+                    continue
+                nid = node_ids[pos]
+                idx = self.tag_index.get(nid)
+                if idx is None:
+                    data = batch[pos]
+                    idx = self.tag_index[nid] = len(self.tag_index)
+                    shard = shard_of(nid, len(self.shards))
+                    self.shards[shard].new_tags.append((idx, nid, data.name, data.category, data.unit))
+                    shards.append(shard)
+                indexes[pos] = idx
+            self.tag_shard = np.concatenate([self.tag_shard, np.asarray(shards, dtype=np.int64)])
+        return np.asarray(indexes, dtype=np.int64)
+
+    def _run(self, indexes: np.ndarray, values: np.ndarray, timestamps: np.ndarray, stats: np.ndarray, alerts: Dict[int, List[Alert]], offset: int):
+        """Scatter one chunk (<= capacity samples per shard) to the workers and gather the results."""
+        shard_ids = self.tag_shard[indexes]
+        order = np.argsort(shard_ids, kind="stable")
+        bounds = np.searchsorted(shard_ids[order], np.arange(len(self.shards) + 1))
+
+        active = []
+        for s, shard in enumerate(self.shards):
+            positions = order[bounds[s]:bounds[s + 1]]
+            n = len(positions)
+            if not n:
+                continue
+            if shard.new_tags:
+                shard.conn.send(("register", shard.new_tags))
+                shard.new_tags = []
+            shard.samples[0, :n] = indexes[positions]
+            shard.samples[1, :n] = values[positions]
+            shard.samples[2, :n] = timestamps[positions]
+            shard.conn.send(("batch", n))
+            active.append((shard, positions))
+
+        # Workers run in parallel; collect once all batches are sent
+        for shard, positions in active:
+            shard_alerts = shard.conn.recv()
+            stats[:, offset + positions] = shard.results[:, :len(positions)]
+            for i, alert in shard_alerts:
+                alerts.setdefault(offset + int(positions[i]), []).append(alert)
+
+    def process_batch(self, batch: List[NormalizedData]) -> BatchResults:
+        """Run stats, anomaly detection and rules on a batch of NormalizedData."""
+        if not self.shards:
+            raise RuntimeError("ShardedAnalytics not started")
+
+        n = len(batch)
+        stats = np.zeros((OUT_FIELDS, n), dtype=np.float64)
+        alerts: Dict[int, List[Alert]] = {}
+        if not n:
+            return BatchResults(batch, stats, alerts)
+
+        indexes = self._register(batch, [d.node_id for d in batch])
+        timestamps = np.asarray([d.timestamp for d in batch], dtype=np.float64)
+        values = _to_floats([d.value for d in batch])
+
+        # Chunks small enough that no shard exceeds its shared memory capacity
+        step = self.capacity
+        for start in range(0, n, step):
+            end = min(start + step, n)
+            self._run(indexes[start:end], values[start:end], timestamps[start:end], stats, alerts, start)
+        return BatchResults(batch, stats, alerts)
+
+
+def bench(samples: int = 20000, tags: int = 2000, workers=(1, 2, 4), rounds: int = 5):
+    """Compare the inline path and the sharded tier on synthetic ticks; prints samples per second."""
+    import random
+    import time
+
+    batches = []
+    for r in range(rounds + 1):
+        batches.append([
+            NormalizedData("opcua", f"ns=2;i={i % tags}", f"Tag{i % tags}", "sensor",
+                           50.0 + random.random() * 10, None, 1_700_000_000.0 + r)
+            for i in range(samples)
+        ])
+
+    stats_engine = StatsEngine()
+    t0 = time.perf_counter()
+    for batch in batches[1:]:
+        for data in batch:
+            s = stats_engine.update(data)
+            detect_anomaly(data.value, s)
+            evaluate_rules(data)
+    inline = (time.perf_counter() - t0) / rounds
+    print(f"inline      : {inline * 1000:7.1f} ms/lot  {samples / inline:10.0f} mesures/s")
+
+    for count in workers:
+        with ShardedAnalytics(workers=count) as analytics:
+            analytics.process_batch(batches[0])  # enregistrement des tags, démarrage des workers
+            t0 = time.perf_counter()
+            for batch in batches[1:]:
+                analytics.process_batch(batch)
+            elapsed = (time.perf_counter() - t0) / rounds
+        print(f"{count} worker(s) : {elapsed * 1000:7.1f} ms/lot  {samples / elapsed:10.0f} mesures/s")
+    print(f"({os.cpu_count()} cœurs disponibles)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Banc d'essai du tier analytics multi-processus")
+    parser.add_argument("--samples", type=int, default=20000, help="mesures par lot")
+    parser.add_argument("--tags", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    bench(args.samples, args.tags, args.workers, args.rounds)
@@ -13,8 +13,9 @@ class StatsEngine:
         """Update stats with a NormalizedData instance and return stats dict.
 
         Returns None if value is non-numeric.
+        Windows are keyed by node_id: browse names ("Temperature") are not unique.
         """
-        key = data.name
+        key = data.node_id or data.name
         value = data.value
 
         # try cast to float
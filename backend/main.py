@@ -1,32 +1,14 @@
-import json
-import os
 import time
-from threading import Thread
+_START = time.perf_counter()
 
 from connectors.opcua_connector import OPCUAConnector
-from models.data_model import NormalizedData
 from normalizer.opcua_normalizer import normalize_opcua_data
-from intelligence.stats_engine import StatsEngine
-from intelligence.anomaly_engine import detect_anomaly
-from intelligence.rules_engine import evaluate_rules
-from storage.db import Database
-from storage.mysql_storage import process_data as mysql_process
-
-# Démarrage du notifier WebSocket
-from ws_notifier import start_notifier_loop
-start_notifier_loop()
-
-def load_config(path: str = "config/opcua_config.json") -> dict:
-    cfg_path = os.path.join(os.path.dirname(__file__), path)
-    try:
-        with open(cfg_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"Erreur : fichier de config {cfg_path} introuvable")
-        return {}
-    except json.JSONDecodeError:
-        print("Erreur : format JSON invalide dans la config")
-        return {}
+from pipeline import AnalyticsPipeline, load_config
+from storage.catalog import CATALOG_MAX_AGE, load_catalog, save_catalog, record_startup_metrics
+from tracing import Tracer, LATENCY_PATH, install_profile_signal, remove_profile_signal
+
+# Le reste (MySQL, SQLite, workers analytics, bus local) est importé à la demande
+IMPORT_TIME = time.perf_counter() - _START
 
 
 def main():
@@ -43,10 +25,23 @@ def main():
     connector = OPCUAConnector(endpoint, username=username, password=password)
     connector.connect()
 
+    pipeline = None
+    db = None
     try:
-        root = connector.get_root()
-        nodes = connector.browse_nodes(root, max_level=3)
-        print(f"→ {len(nodes)} nœuds variables trouvés")
+        # Catalogue en cache : évite de parcourir tout l'espace d'adressage au démarrage
+        max_age = float(cfg.get("catalog_max_age_s", CATALOG_MAX_AGE))
+        nodes = None if cfg.get("refresh_catalog") else load_catalog(endpoint, max_age=max_age)
+        if nodes is None:
+            root = connector.get_root()
+            nodes = connector.browse_nodes(root, max_level=3)
+            save_catalog(endpoint, nodes)
+            if nodes:
+                print(f"→ {len(nodes)} nœuds variables trouvés (catalogue mis à jour)")
+            else:
+                print("⚠️ Aucun nœud variable trouvé (catalogue non enregistré)")
+        else:
+            print(f"→ {len(nodes)} nœuds variables chargés depuis le catalogue")
+        connector.names.update({n["nodeid"]: n["name"] for n in nodes})
 
         # On prend les 5 premiers nœuds (tu peux augmenter si tu veux)
         node_ids = [n["nodeid"] for n in nodes[:5]]
@@ -54,29 +49,68 @@ def main():
 
         gen = connector.read_realtime(node_ids, interval=1.0)  # ← 1 seconde
 
-        stats_engine = StatsEngine()
+        # Stats, anomalies, règles, corrélations et prévisions (voir pipeline.py)
+        pipeline = AnalyticsPipeline(cfg)
+
+        # Traçage de latence d'une fraction des lectures, profil à la demande (kill -USR1 <pid>)
+        tracer = Tracer(sample_rate=float(cfg.get("trace_sample_rate", 0.01)), dump_path=LATENCY_PATH)
+        install_profile_signal(float(cfg.get("profile_seconds", 10)))
 
         use_mysql = True
         print("Mode FORCÉ : utilisation de MySQL activée")
 
-        db = None
-        if not use_mysql:
+        if use_mysql:
+            from storage.mysql_storage import process_data as mysql_process
+            from db.mysql_client import get_connection
+            from db.schema import latest_version, schema_version
+            try:
+                conn = get_connection()
+                try:
+                    version, latest = schema_version(conn), latest_version(conn)
+                finally:
+                    conn.close()
+                if version < latest:
+                    print(f"⚠️ Schéma MySQL en version {version} (dernière : {latest}) → python -m db.migrate upgrade")
+            except Exception as e:
+                print(f"Version du schéma MySQL inconnue : {e}")
+        else:
+            from storage.db import Database
             db = Database()
             db.init_db()
             print("→ SQLite activé comme fallback")
 
         print("=== COLLECTE EN TEMPS RÉEL DÉMARRÉE (toutes les 1 seconde) ===")
 
+        first_sample_time = None
+
         # Boucle infinie
         while True:
             raw_batch = next(gen)
-            
+
+            if first_sample_time is None:
+                first_sample_time = time.perf_counter() - _START
+                print(f"Démarrage : imports {IMPORT_TIME * 1000:.0f} ms, "
+                      f"premier échantillon {first_sample_time * 1000:.0f} ms")
+                record_startup_metrics({
+                    "started_at": int(time.time()),
+                    "endpoint": endpoint,
+                    "import_time_ms": round(IMPORT_TIME * 1000, 1),
+                    "time_to_first_sample_ms": round(first_sample_time * 1000, 1),
+                    "nodes": len(node_ids),
+                })
+
+            batch = []
             for item in raw_batch:
                 node_id = item.get("nodeid")
                 value = item.get("value")
                 raw_name = item.get("name")
 
-                normalized = normalize_opcua_data(node_id, value, raw_name=raw_name)
+                trace = tracer.start(item.get("source_ts"), item.get("server_ts"), item.get("received_ts"))
+                normalized = normalize_opcua_data(node_id, value, raw_name=raw_name,
+                                                  timestamp=item.get("timestamp"))
+                normalized.trace = trace
+                tracer.mark(trace, "normalized")
+                batch.append(normalized)
 
                 # Persistance
                 if use_mysql:
@@ -84,21 +118,31 @@ def main():
                 else:
                     try:
                         db.insert_measure(normalized)
+                        tracer.mark(trace, "persisted")
                     except Exception as e:
                         print(f"   → ÉCHEC SQLite : {type(e).__name__} → {e}")
+                tracer.finish(trace)
+
+            # Stats, anomalies, alertes (optionnel)
+            results, correlation_alerts, forecast_alerts = pipeline.process(batch)
 
-                # Stats, anomalies, alertes (optionnel)
-                stats = stats_engine.update(normalized)
+            for result in results:
+                stats = result["stats"]
                 if stats:
                     print(f"   stats → avg={stats['avg']:.3f}  min={stats['min']}  max={stats['max']}")
 
-                if stats and detect_anomaly(normalized.value, stats):
-                    print(f"   ⚠️  Anomalie détectée sur {normalized.name}")
+                if result["anomaly"]:
+                    print(f"   ⚠️  Anomalie détectée sur {result['data'].name}")
 
-                alerts = evaluate_rules(normalized)
-                for alert in alerts:
+                for alert in result["alerts"]:
                     print(f"   🚨 {alert.severity} — {alert.message}")
 
+            for alert in correlation_alerts:
+                print(f"   🔗 {alert.severity} — {alert.message}")
+
+            for alert in forecast_alerts:
+                print(f"   📈 {alert.severity} — {alert.message}")
+
             # Petite pause pour éviter surcharge CPU (facultatif)
             time.sleep(0.1)
 
@@ -108,6 +152,10 @@ def main():
         print(f"Erreur globale : {type(e).__name__} → {e}")
     finally:
         connector.disconnect()
+        # Le PID ne doit plus être signalé une fois le collecteur arrêté (il peut être réutilisé)
+        remove_profile_signal()
+        if pipeline:
+            pipeline.close()
         if db:
             try:
                 db.close()
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional, Any
+from typing import Optional, Any, Dict
 
 
 @dataclass
@@ -10,7 +10,8 @@ class NormalizedData:
     category: str             # system, sensor, machine, unknown
     value: Any
     unit: Optional[str]
-    timestamp: int            # UNIX timestamp
+    timestamp: float          # UNIX timestamp of collection (OPC UA source timestamp: see trace)
+    trace: Optional[Dict[str, float]] = None  # stage -> UNIX timestamp, sampled readings only (see tracing.py)
 
 
 @dataclass
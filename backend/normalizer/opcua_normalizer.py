@@ -1,5 +1,6 @@
 import time
-from typing import Any, Dict
+from datetime import timezone
+from typing import Any, Dict, Optional
 from models.data_model import NormalizedData
 
 # Simple mapping table - extendable for project-specific NodeIds
@@ -10,6 +11,18 @@ NODE_MAPPING: Dict[str, Dict[str, Any]] = {
 }
 
 
+def to_unix(dt) -> Optional[float]:
+    """OPC UA DateTime -> float UNIX timestamp, None if missing.
+
+    Shared by the sync and async connectors for DataValue Source / Server timestamps.
+    """
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
 def _format_value(raw_value: Any) -> Any:
     # Datetime -> ISO string
     if hasattr(raw_value, "isoformat"):
@@ -28,7 +41,8 @@ def _format_value(raw_value: Any) -> Any:
     return raw_value
 
 
-def normalize_opcua_data(node_id: str, raw_value: Any, raw_name: str = None) -> NormalizedData:
+def normalize_opcua_data(node_id: str, raw_value: Any, raw_name: str = None,
+                         timestamp: float = None) -> NormalizedData:
     mapping = NODE_MAPPING.get(node_id, None)
 
     if mapping is None:
@@ -54,5 +68,5 @@ def normalize_opcua_data(node_id: str, raw_value: Any, raw_name: str = None) ->
         category=category,
         value=value,
         unit=unit,
-        timestamp=int(time.time()),
+        timestamp=timestamp if timestamp is not None else time.time(),
     )
@@ -1,7 +1,9 @@
 # opc_monitor_universel.py
 from opcua import Client, ua
+import shutil
+import sys
 import time
-from datetime import datetime
+from datetime import datetime, timezone
 
 
 # CONFIGURATION
@@ -10,6 +12,13 @@ START_NODE_ID = "ns=0;i=84"  # Objects
 REFRESH_INTERVAL = 5
 MAX_DEPTH = 5
 
+# Mode explorateur : filtrage AccessLevel à la découverte, lectures groupées,
+# et seules les lignes modifiées sont redessinées
+EXPLORER_MODE = True
+READ_BATCH_SIZE = 500      # nœuds par requête Read (plafonné à MaxNodesPerRead du serveur)
+USE_SUBSCRIPTION = False   # True : abonnement aux changements au lieu de lectures périodiques
+CURRENT_READ = 0x01        # bit CurrentRead de AccessLevel / UserAccessLevel
+
 
 def connect_to_server(url):
     client = Client(url)
@@ -74,6 +83,192 @@ def read_node_data(node):
         return None
 
 
+def discover_variables(client, node, max_depth=5, current_depth=0, seen=None):
+    """Parcours via ReferenceDescription : la classe et le DisplayName arrivent avec le Browse,
+    sans aller-retour supplémentaire par enfant. Retourne [(nodeid, display_name, depth)]."""
+    if current_depth >= max_depth:
+        return []
+    seen = set() if seen is None else seen
+
+    variables = []
+    try:
+        refs = node.get_children_descriptions()
+    except Exception:
+        return variables
+
+    for ref in refs:
+        nodeid = ref.NodeId
+        key = nodeid.to_string()
+        if key in seen:
+            continue
+        seen.add(key)
+        if ref.NodeClass == ua.NodeClass.Variable:
+            name = ref.DisplayName.Text if ref.DisplayName and ref.DisplayName.Text else "Sans nom"
+            variables.append((nodeid, name, current_depth + 1))
+        variables.extend(discover_variables(client, client.get_node(nodeid), max_depth, current_depth + 1, seen))
+
+    return variables
+
+
+def read_batch_size(client):
+    """READ_BATCH_SIZE, plafonné à OperationLimits/MaxNodesPerRead (0 ou absent : pas de limite annoncée)."""
+    try:
+        node = client.get_node(ua.NodeId(ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead))
+        limit = int(node.get_value() or 0)
+    except Exception:
+        limit = 0
+    return min(READ_BATCH_SIZE, limit) if limit > 0 else READ_BATCH_SIZE
+
+
+def read_attributes(client, requests, batch_size=READ_BATCH_SIZE):
+    """Lecture groupée de [(nodeid, attribute_id)] en requêtes de batch_size nœuds ; retourne les DataValue."""
+    results = []
+    for i in range(0, len(requests), batch_size):
+        params = ua.ReadParameters()
+        for nodeid, attribute in requests[i:i + batch_size]:
+            rv = ua.ReadValueId()
+            rv.NodeId = nodeid
+            rv.AttributeId = attribute
+            params.NodesToRead.append(rv)
+        results.extend(client.uaclient.read(params))
+    return results
+
+
+def _can_read(dv):
+    return dv.StatusCode.is_good() and dv.Value is not None and bool(dv.Value.Value & CURRENT_READ)
+
+
+def filter_readable(client, candidates, batch_size=READ_BATCH_SIZE):
+    """Ne garde que les variables dont AccessLevel et UserAccessLevel autorisent la lecture (une seule fois)."""
+    requests = []
+    for nodeid, _, _ in candidates:
+        requests.append((nodeid, ua.AttributeIds.AccessLevel))
+        requests.append((nodeid, ua.AttributeIds.UserAccessLevel))
+    results = read_attributes(client, requests, batch_size)
+
+    readable = []
+    for i, candidate in enumerate(candidates):
+        access, user_access = results[2 * i], results[2 * i + 1]
+        # UserAccessLevel absent : on se fie à AccessLevel
+        if _can_read(access) and (_can_read(user_access) or not user_access.StatusCode.is_good()):
+            readable.append(candidate)
+    return readable
+
+
+def _format_time(dt):
+    if dt is None:
+        return datetime.now().strftime("%H:%M:%S")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone().strftime("%H:%M:%S")
+
+
+class _SubscriptionHandler:
+    def __init__(self, latest):
+        self.latest = latest
+
+    def datachange_notification(self, node, val, data):
+        self.latest[node.nodeid.to_string()] = data.monitored_item.Value
+
+
+class TableRenderer:
+    """Affiche le tableau une fois, puis ne réécrit que les lignes modifiées.
+
+    Dans un terminal assez haut, les lignes sont réécrites en place (ANSI) ;
+    sinon seules les lignes modifiées sont imprimées à chaque cycle.
+    """
+
+    HEADER_LINES = 3
+
+    def __init__(self, rows):
+        # rows : [(key, display_name, depth)]
+        self.rows = rows
+        self.line_of = {key: i for i, (key, _, _) in enumerate(rows)}
+        self.shown = {}
+        self.drawn = False
+        height = shutil.get_terminal_size((120, 0)).lines
+        self.in_place = sys.stdout.isatty() and len(rows) + self.HEADER_LINES + 2 <= height
+
+    def _format_row(self, i, value, last_update):
+        key, name, depth = self.rows[i]
+        indent = "  " * depth
+        return f"{indent}{key:<35} {indent + name:<50} {str(value):<40} {last_update:<15}"
+
+    def draw(self, values):
+        """values : {key: (value, last_update)} ; retourne le nombre de lignes modifiées."""
+        first = not self.drawn
+        self.drawn = True
+        changed = [key for key, current in values.items()
+                   if key not in self.shown or self.shown[key][0] != current[0]]
+        for key in changed:
+            self.shown[key] = values[key]
+
+        if first:
+            if self.in_place:
+                sys.stdout.write("\x1b[2J\x1b[H")
+            print(f"{'NodeId':<35} {'DisplayName':<50} {'Value':<40} {'Last Update':<15}")
+            print("-" * 100)
+            print()
+            for i, (key, _, _) in enumerate(self.rows):
+                value, last_update = self.shown.get(key, ("", ""))
+                print(self._format_row(i, value, last_update))
+        elif self.in_place:
+            for key in changed:
+                i = self.line_of[key]
+                value, last_update = self.shown[key]
+                sys.stdout.write(f"\x1b[{self.HEADER_LINES + i + 1};1H\x1b[K{self._format_row(i, value, last_update)}")
+            sys.stdout.write(f"\x1b[{self.HEADER_LINES + len(self.rows) + 2};1H\x1b[K")
+        elif changed:
+            print(f"\n{datetime.now().strftime('%H:%M:%S')} : {len(changed)} valeurs modifiées")
+            for key in changed:
+                value, last_update = self.shown[key]
+                print(self._format_row(self.line_of[key], value, last_update))
+
+        if self.in_place:
+            sys.stdout.write(f"\x1b[{self.HEADER_LINES};1H\x1b[KHeure actuelle : "
+                             f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {len(self.rows)} variables lisibles")
+            sys.stdout.write(f"\x1b[{self.HEADER_LINES + len(self.rows) + 2};1H")
+        sys.stdout.flush()
+        return len(changed)
+
+
+def explore(client, start_node):
+    print(f"Découverte des variables (profondeur max {MAX_DEPTH})...")
+    candidates = discover_variables(client, start_node, max_depth=MAX_DEPTH)
+    print(f"{len(candidates)} candidats trouvés.")
+
+    # Un serveur avec une limite plus basse répondrait BadTooManyOperations à toute la requête
+    batch_size = read_batch_size(client)
+    readable = filter_readable(client, candidates, batch_size)
+    print(f"{len(readable)} variables lisibles (AccessLevel / UserAccessLevel).\n")
+    if not readable:
+        print("Aucune variable lisible.")
+        return
+
+    rows = [(nodeid.to_string(), name, depth) for nodeid, name, depth in readable]
+    renderer = TableRenderer(rows)
+
+    latest = {}
+    if USE_SUBSCRIPTION:
+        sub = client.create_subscription(int(REFRESH_INTERVAL * 1000), _SubscriptionHandler(latest))
+        nodes = [client.get_node(nodeid) for nodeid, _, _ in readable]
+        for i in range(0, len(nodes), READ_BATCH_SIZE):
+            sub.subscribe_data_change(nodes[i:i + READ_BATCH_SIZE])
+
+    value_requests = [(nodeid, ua.AttributeIds.Value) for nodeid, _, _ in readable]
+    while True:
+        if not USE_SUBSCRIPTION:
+            for (key, _, _), dv in zip(rows, read_attributes(client, value_requests, batch_size)):
+                latest[key] = dv
+
+        values = {}
+        for key, dv in list(latest.items()):
+            if dv.StatusCode.is_good() and dv.Value is not None and dv.Value.Value is not None:
+                values[key] = (dv.Value.Value, _format_time(dv.SourceTimestamp))
+        renderer.draw(values)
+        time.sleep(REFRESH_INTERVAL)
+
+
 def main():
     client = connect_to_server(SERVER_URL)
     if not client:
@@ -83,6 +278,10 @@ def main():
         start_node = client.get_node(START_NODE_ID)
         print(f"Nœud de départ : {start_node.nodeid} ({start_node.get_display_name().Text})\n")
 
+        if EXPLORER_MODE:
+            explore(client, start_node)
+            return
+
         print(f"Découverte des candidats Variables (profondeur max {MAX_DEPTH})...")
         candidates = discover_variable_nodes_recursive(start_node, max_depth=MAX_DEPTH)
         print(f"{len(candidates)} candidats trouvés.\n")
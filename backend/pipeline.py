@@ -0,0 +1,101 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from models.alert_model import Alert
+from models.data_model import NormalizedData
+from intelligence.stats_engine import StatsEngine
+from intelligence.anomaly_engine import ANOMALY_THRESHOLD, detect_anomaly
+from intelligence.rules_engine import evaluate_rules, merge_thresholds
+
+
+def load_config(path: str = "config/opcua_config.json") -> dict:
+    cfg_path = os.path.join(os.path.dirname(__file__), path)
+    try:
+        with open(cfg_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Erreur : fichier de config {cfg_path} introuvable")
+        return {}
+    except json.JSONDecodeError:
+        print("Erreur : format JSON invalide dans la config")
+        return {}
+
+
+class AnalyticsPipeline:
+    """Stats → anomalies → règles (+ corrélations et prévisions) on batches of NormalizedData.
+
+    Shared by the live collector (main.py) and the historical replay (replay.py)
+    so both run exactly the same analytics. Optional stages are enabled by the
+    config keys analytics_workers, correlation_groups and forecast_horizon.
+    Detector settings come from `thresholds` ({"Temperature": {"warning": 55}},
+    merged into the rules_engine defaults) and `anomaly_threshold`, and are
+    handed to every stage, worker processes included.
+    """
+
+    def __init__(self, cfg: dict):
+        self.stats_engine = StatsEngine()
+        self.thresholds = merge_thresholds(cfg.get("thresholds"))
+        self.anomaly_threshold = float(cfg.get("anomaly_threshold", ANOMALY_THRESHOLD))
+
+        # 0 = analytics inline sur le thread principal, N = N processus workers
+        self.analytics = None
+        analytics_workers = int(cfg.get("analytics_workers", 0))
+        if analytics_workers:
+            from intelligence.sharded_analytics import ShardedAnalytics
+            self.analytics = ShardedAnalytics(workers=analytics_workers, thresholds=self.thresholds,
+                                              anomaly_threshold=self.anomaly_threshold)
+            self.analytics.start()
+
+        # Groupes de tags surveillés ensemble : {"nom": [node_id, ...]}
+        self.correlation = None
+        if cfg.get("correlation_groups"):
+            from intelligence.correlation_engine import CorrelationEngine
+            self.correlation = CorrelationEngine(cfg["correlation_groups"])
+
+        # Alerte précoce quand un seuil est prévu dans moins de N secondes (0 = désactivé)
+        self.forecast = None
+        if cfg.get("forecast_horizon"):
+            from intelligence.forecast_engine import ForecastEngine
+            self.forecast = ForecastEngine(horizon=float(cfg["forecast_horizon"]), thresholds=self.thresholds)
+
+    def process(self, batch: List[NormalizedData], now: Optional[float] = None) -> Tuple[List[Dict], List[Alert], List[Alert]]:
+        """Run every stage on one tick.
+
+        Returns (per-sample results, correlation alerts, forecast alerts); each
+        per-sample result is {"data", "stats", "anomaly", "alerts"}.
+        `now` defaults to the wall clock; replay passes the tick timestamp.
+        """
+        if self.analytics:
+            results = self.analytics.process_batch(batch)
+        else:
+            results = []
+            for normalized in batch:
+                stats = self.stats_engine.update(normalized)
+                results.append({
+                    "data": normalized,
+                    "stats": stats,
+                    "anomaly": bool(stats and detect_anomaly(normalized.value, stats, self.anomaly_threshold)),
+                    "alerts": evaluate_rules(normalized, self.thresholds),
+                })
+
+        correlation_alerts: List[Alert] = []
+        if self.correlation:
+            tick = {}
+            for normalized in batch:
+                try:
+                    tick[normalized.node_id] = float(normalized.value)
+                except Exception:
+                    continue
+            correlation_alerts = self.correlation.update(tick, timestamp=int(now) if now else None)
+
+        forecast_alerts: List[Alert] = []
+        if self.forecast:
+            forecast_alerts = self.forecast.update(batch, now=now)
+
+        return results, correlation_alerts, forecast_alerts
+
+    def close(self):
+        if self.analytics:
+            self.analytics.close()
+            self.analytics = None
@@ -0,0 +1,262 @@
+# replay.py
+"""Rejoue des mesures historiques dans le pipeline normalize → stats → anomalies → règles.
+
+Exemples :
+    python replay.py --source sqlite --start "2026-01-01" --end "2026-02-01"
+    python replay.py --source mysql --start "2026-01-01 08:00" --speed 60
+    python replay.py --source archive --path export.csv.gz --config-override '{"forecast_horizon": 120}'
+
+--speed 0 (défaut) rejoue aussi vite que possible, --speed N rejoue à N× le temps réel.
+"""
+import argparse
+import csv
+import gzip
+import heapq
+import itertools
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from normalizer.opcua_normalizer import normalize_opcua_data
+from pipeline import AnalyticsPipeline, load_config
+from intelligence.sharded_analytics import BatchResults
+
+CHUNK_SIZE = 10000
+
+# (node_id, name, value, unix timestamp)
+Row = Tuple[str, str, object, float]
+
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _mysql_rows(table: str, value: str, start: Optional[float], end: Optional[float]) -> Iterator[Row]:
+    from db.mysql_client import get_connection
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT n.node_id, n.name, {value}, UNIX_TIMESTAMP(m.timestamp)
+            FROM {table} m
+            JOIN nodes n ON m.node_id = n.id
+            WHERE m.timestamp >= FROM_UNIXTIME(%s) AND m.timestamp < FROM_UNIXTIME(%s)
+            ORDER BY m.timestamp, m.id
+            """,
+            (start or 0, end or 2 ** 31 - 1),
+        )
+        for r in cur:
+            yield r[0], r[1], r[2], float(r[3])
+        cur.close()
+    finally:
+        conn.close()
+
+
+def read_mysql(start: Optional[float], end: Optional[float], chunk_size: int) -> Iterator[List[Row]]:
+    from db.mysql_client import get_connection
+    from db.schema import text_split_enabled
+
+    conn = get_connection()
+    try:
+        split = text_split_enabled(conn)
+    finally:
+        conn.close()
+
+    if split:
+        # Deux flux triés (une connexion chacun) fusionnés par horodatage
+        rows = heapq.merge(_mysql_rows("measurements", "m.value", start, end),
+                           _mysql_rows("measurements_text", "m.text_value", start, end),
+                           key=lambda r: r[3])
+    else:
+        rows = _mysql_rows("measurements", "COALESCE(m.text_value, m.value)", start, end)
+
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def _json_value(text):
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return text
+
+
+def read_sqlite(start: Optional[float], end: Optional[float], chunk_size: int,
+                path: Optional[str] = None) -> Iterator[List[Row]]:
+    """Rows of a SQLite database (the collector's by default), opened read-only.
+
+    No migration is applied: a backtest must not add indexes or bump
+    user_version on the live database or on an archive.
+    """
+    import sqlite3
+    from pathlib import Path
+    from storage.db import Database
+
+    uri = Path(Database(path).db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT node_id,name,value,timestamp FROM measurements "
+            "WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp, id",
+            (start or 0, end or 2 ** 63 - 1),
+        )
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [(r[0], r[1], _json_value(r[2]), float(r[3])) for r in rows]
+    finally:
+        conn.close()
+
+
+def read_archive(path: str, start: Optional[float], end: Optional[float], chunk_size: int) -> Iterator[List[Row]]:
+    """CSV or JSON Lines file (optionally .gz) with node_id, name, value, timestamp fields, sorted by time."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        if ".csv" in path:
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        chunk: List[Row] = []
+        for rec in records:
+            ts = _parse_time(str(rec["timestamp"]))
+            if (start and ts < start) or (end and ts >= end):
+                continue
+            chunk.append((rec["node_id"], rec.get("name") or rec["node_id"], rec["value"], ts))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def iter_ticks(chunks: Iterator[List[Row]]) -> Iterator[Tuple[float, List[Row]]]:
+    """Regroup rows sharing the same timestamp (second) into one tick, like one collector cycle."""
+    current: List[Row] = []
+    current_ts = None
+    for chunk in chunks:
+        for row in chunk:
+            ts = int(row[3])
+            if current and ts != current_ts:
+                yield current_ts, current
+                current = []
+            current_ts = ts
+            current.append(row)
+    if current:
+        yield current_ts, current
+
+
+def replay(chunks: Iterator[List[Row]], cfg: dict, speed: float = 0.0, verbose: bool = False) -> dict:
+    """Stream rows through AnalyticsPipeline and return a report (counts and timings)."""
+    pipeline = AnalyticsPipeline(cfg)
+    alerts = Counter()
+    samples = ticks = 0
+    pipeline_time = 0.0
+    first_ts = last_ts = None
+    wall_start = time.perf_counter()
+
+    try:
+        for ts, rows in iter_ticks(chunks):
+            if speed and last_ts is not None:
+                # N× temps réel : attend l'écart (divisé) entre deux ticks
+                target = wall_start + (ts - first_ts) / speed
+                delay = target - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            first_ts = ts if first_ts is None else first_ts
+            last_ts = ts
+
+            batch = []
+            for node_id, name, value, sample_ts in rows:
+                normalized = normalize_opcua_data(node_id, value, raw_name=name, timestamp=sample_ts)
+                batch.append(normalized)
+
+            t0 = time.perf_counter()
+            results, correlation_alerts, forecast_alerts = pipeline.process(batch, now=ts)
+            pipeline_time += time.perf_counter() - t0
+
+            samples += len(batch)
+            ticks += 1
+            if isinstance(results, BatchResults):
+                # Résultats en colonnes du tier multi-processus : pas de dict par mesure
+                anomalies = int(results.anomaly.sum())
+                rule_alerts = results.all_alerts()
+            else:
+                anomalies = sum(1 for result in results if result["anomaly"])
+                rule_alerts = [alert for result in results for alert in result["alerts"]]
+            if anomalies:
+                alerts["anomaly"] += anomalies
+            for alert in rule_alerts:
+                alerts[f"rule_{alert.severity}"] += 1
+                if verbose:
+                    print(f"   🚨 {datetime.fromtimestamp(alert.timestamp)} {alert.severity} — {alert.message}")
+            for alert in correlation_alerts:
+                alerts["correlation"] += 1
+                if verbose:
+                    print(f"   🔗 {datetime.fromtimestamp(alert.timestamp)} {alert.message}")
+            for alert in forecast_alerts:
+                alerts[f"forecast_{alert.severity}"] += 1
+                if verbose:
+                    print(f"   📈 {datetime.fromtimestamp(alert.timestamp)} {alert.message}")
+    finally:
+        pipeline.close()
+
+    elapsed = time.perf_counter() - wall_start
+    return {
+        "samples": samples,
+        "ticks": ticks,
+        "data_span_s": (last_ts - first_ts) if ticks else 0,
+        "elapsed_s": round(elapsed, 3),
+        "pipeline_s": round(pipeline_time, 3),
+        "samples_per_s": round(samples / elapsed) if elapsed > 0 else None,
+        "alerts": dict(alerts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu historique des mesures (backtest règles / détecteurs)")
+    parser.add_argument("--source", choices=("mysql", "sqlite", "archive"), default="sqlite")
+    parser.add_argument("--path", help="fichier SQLite ou archive CSV / JSONL (.gz accepté)")
+    parser.add_argument("--start", help="début (ISO 8601 ou timestamp UNIX)")
+    parser.add_argument("--end", help="fin exclue (ISO 8601 ou timestamp UNIX)")
+    parser.add_argument("--speed", type=float, default=0.0, help="0 = vitesse max, N = N× temps réel")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--config-override", default="{}", help="JSON fusionné dans la config (seuils de détecteurs...)")
+    parser.add_argument("--verbose", action="store_true", help="affiche chaque alerte")
+    args = parser.parse_args()
+
+    cfg = load_config()
+    cfg.update(json.loads(args.config_override))
+    # Réglages à évaluer : {"thresholds": {"Temperature": {"warning": 55}}, "anomaly_threshold": 0.2},
+    # transmis explicitement par AnalyticsPipeline (workers analytics compris)
+    start, end = _parse_time(args.start), _parse_time(args.end)
+
+    if args.source == "mysql":
+        chunks = read_mysql(start, end, args.chunk_size)
+    elif args.source == "sqlite":
+        chunks = read_sqlite(start, end, args.chunk_size, args.path)
+    else:
+        if not args.path:
+            parser.error("--path est requis pour --source archive")
+        chunks = read_archive(args.path, start, end, args.chunk_size)
+
+    print(f"=== REJEU {args.source} ({'vitesse max' if not args.speed else f'{args.speed}× temps réel'}) ===")
+    report = replay(chunks, cfg, speed=args.speed, verbose=args.verbose)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
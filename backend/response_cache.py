@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+MAX_ENTRIES = 256
+GZIP_MIN_SIZE = 1024  # smaller bodies are not worth compressing
+
+
+class _Entry:
+    __slots__ = ("body", "gzipped", "etag", "gzip_etag", "expires", "tags")
+
+    def __init__(self, body: bytes, ttl: float, tags: Iterable[str]):
+        self.body = body
+        self.gzipped: Optional[bytes] = None
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        self.etag = f'"{digest}"'
+        # Strong ETags identify the exact bytes: the gzip variant gets its own
+        self.gzip_etag = f'"{digest}-gz"'
+        self.expires = time.monotonic() + ttl
+        self.tags = set(tags)
+
+
+def _etags(header: str) -> set:
+    """ETags listed in an If-None-Match header (weak prefix ignored)."""
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+class ResponseCache:
+    """Serialized JSON responses keyed by route + query parameters.
+
+    Entries expire after their TTL, the least recently used ones are evicted
+    beyond `max_entries`, and invalidate(tag) drops every entry carrying a tag
+    (e.g. "nodes" when the collector inserts a node); a response produced
+    while one of its tags was invalidated is served but not stored, since it
+    may predate the change. Responses carry an ETag
+    so unchanged resources answer 304, and are gzip-compressed once, on
+    demand, for clients that accept it (with a distinct ETag).
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.lock = threading.Lock()
+        # Incremented by invalidate(): a producer that ran across a change of its tags is not cached
+        self.generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: str) -> Optional[_Entry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.expires < time.monotonic():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _generations(self, tags: Iterable[str]) -> Dict[str, int]:
+        with self.lock:
+            return {tag: self.generations.get(tag, 0) for tag in tags}
+
+    def _set(self, key: str, entry: _Entry, generations: Dict[str, int]):
+        """Store an entry unless one of its tags was invalidated since `generations` was taken."""
+        with self.lock:
+            if any(self.generations.get(tag, 0) != gen for tag, gen in generations.items()):
+                return
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, *tags: str):
+        """Drop every entry carrying at least one of `tags`."""
+        tags = set(tags)
+        with self.lock:
+            for tag in tags:
+                self.generations[tag] = self.generations.get(tag, 0) + 1
+            for key in [k for k, e in self.entries.items() if not tags.isdisjoint(e.tags)]:
+                del self.entries[key]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+    def respond(self, request: Request, producer: Callable[[], object], ttl: float, tags: Iterable[str] = ()) -> Response:
+        """Serve `producer()` as JSON from the cache, with ETag / 304 and gzip support."""
+        key = request.url.path + "?" + str(request.query_params)
+        entry = self._get(key)
+        if entry is None:
+            generations = self._generations(tags)
+            # Même encodage que les réponses FastAPI (datetime ISO 8601, Decimal...)
+            content = jsonable_encoder(producer())
+            body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            entry = _Entry(body, ttl, tags)
+            self._set(key, entry, generations)
+
+        use_gzip = len(entry.body) >= GZIP_MIN_SIZE and "gzip" in request.headers.get("accept-encoding", "")
+        etag = entry.gzip_etag if use_gzip else entry.etag
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag in _etags(request.headers.get("if-none-match", "")):
+            return Response(status_code=304, headers=headers)
+
+        body = entry.body
+        if use_gzip:
+            if entry.gzipped is None:
+                entry.gzipped = gzip.compress(body, compresslevel=6)
+            body = entry.gzipped
+            headers["Content-Encoding"] = "gzip"
+        return Response(content=body, media_type="application/json", headers=headers)
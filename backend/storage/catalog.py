@@ -0,0 +1,60 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CATALOG_PATH = os.path.join(BASE_DIR, "data", "node_catalog.json")
+STARTUP_METRICS_PATH = os.path.join(BASE_DIR, "data", "startup_metrics.jsonl")
+CATALOG_MAX_AGE = 7 * 24 * 3600  # seconds before the address space is browsed again
+
+
+def load_catalog(endpoint: str, path: str = CATALOG_PATH, max_age: float = CATALOG_MAX_AGE) -> Optional[List[Dict]]:
+    """Return the cached node list for an endpoint, or None if not cached.
+
+    An empty list (failed browse) or an entry browsed more than `max_age`
+    seconds ago counts as a miss.
+    Entries have the same shape as OPCUAConnector.browse_nodes(): nodeid, name, level.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    entry = catalog.get(endpoint)
+    if not entry or not entry.get("nodes"):
+        return None
+    if time.time() - entry.get("browsed_at", 0) > max_age:
+        return None
+    return entry["nodes"]
+
+
+def save_catalog(endpoint: str, nodes: List[Dict], path: str = CATALOG_PATH):
+    """Store the browsed node list for an endpoint (other endpoints are kept).
+
+    An empty list is not stored: browse_nodes() returns [] on errors, and
+    caching it would leave the collector with no node at every restart.
+    """
+    if not nodes:
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        catalog = {}
+    catalog[endpoint] = {"browsed_at": int(time.time()), "nodes": nodes}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def record_startup_metrics(metrics: Dict, path: str = STARTUP_METRICS_PATH):
+    """Append one JSON line of startup timings (import time, time to first sample...)."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(metrics) + "\n")
+    except OSError as e:
+        print(f"Impossible d'enregistrer les métriques de démarrage : {e}")
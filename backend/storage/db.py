@@ -4,6 +4,7 @@ import json
 from typing import Optional
 from models.data_model import NormalizedData
 from models.alert_model import Alert
+from db.schema import upgrade
 
 
 class Database:
@@ -16,36 +17,8 @@ class Database:
 
     def init_db(self):
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        cur = self.conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS measurements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                source TEXT,
-                node_id TEXT,
-                name TEXT,
-                category TEXT,
-                value TEXT,
-                unit TEXT,
-                timestamp INTEGER
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                node_id TEXT,
-                severity TEXT,
-                message TEXT,
-                value REAL,
-                threshold REAL,
-                timestamp INTEGER
-            )
-            """
-        )
-        self.conn.commit()
+        # Tables et index versionnés (db/schema.py), appliqués si la base est en retard
+        upgrade(self.conn, verbose=False)
 
     def insert_measure(self, m: NormalizedData):
         if not self.conn:
@@ -57,7 +30,7 @@ class Database:
             val_text = str(m.value)
         cur.execute(
             "INSERT INTO measurements (source,node_id,name,category,value,unit,timestamp) VALUES (?,?,?,?,?,?,?)",
-            (m.source, m.node_id, m.name, m.category, val_text, m.unit, m.timestamp),
+            (m.source, m.node_id, m.name, m.category, val_text, m.unit, int(m.timestamp)),
         )
         self.conn.commit()
 
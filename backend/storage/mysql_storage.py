@@ -1,8 +1,10 @@
 import json
-from typing import Any, Optional, Tuple
+import time
+from typing import Any, Dict, Optional, Tuple
 
 from models.data_model import NormalizedData
 from db.mysql_client import get_connection
+from db.schema import layout_changed, text_split
 
 # Import du notifier thread-safe
 from ws_notifier import notify_new_measurement
@@ -24,6 +26,39 @@ def get_storable_values(val: Any) -> Tuple[Optional[float], Optional[str]]:
     except Exception:
         return None, str(val)[:2000]
 
+# node_id OPC UA -> nodes.id ; les id ne changent pas, inutile de relire la table à chaque mesure
+_node_ids: Dict[str, int] = {}
+
+def _insert_measurement(conn, cursor, node_db_id: int, numeric_value, text_value, timestamp: float):
+    # Horodatage à la milliseconde (DATETIME(3) depuis la migration 3)
+    # Valeurs texte dans measurements_text une fois la migration 4 appliquée
+    split = text_split(conn)
+    if split and text_value is not None:
+        cursor.execute(
+            """
+            INSERT INTO measurements_text (node_id, text_value, timestamp)
+            VALUES (%s, %s, FROM_UNIXTIME(%s))
+            """,
+            (node_db_id, text_value, round(timestamp, 3))
+        )
+    elif split:
+        cursor.execute(
+            """
+            INSERT INTO measurements (node_id, value, timestamp)
+            VALUES (%s, %s, FROM_UNIXTIME(%s))
+            """,
+            (node_db_id, numeric_value, round(timestamp, 3))
+        )
+    else:
+        cursor.execute(
+            """
+            INSERT INTO measurements 
+            (node_id, value, text_value, timestamp)
+            VALUES (%s, %s, %s, FROM_UNIXTIME(%s))
+            """,
+            (node_db_id, numeric_value, text_value, round(timestamp, 3))
+        )
+
 def process_data(data: NormalizedData) -> bool:
     conn = None
     cursor = None
@@ -33,64 +68,71 @@ def process_data(data: NormalizedData) -> bool:
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
 
-        cursor.execute(
-            "SELECT id FROM nodes WHERE node_id = %s LIMIT 1",
-            (data.node_id,)
-        )
-        node_row = cursor.fetchone()
-
-        if not node_row:
-            cursor.execute(
-                """
-                INSERT INTO nodes (node_id, name, category, unit)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (data.node_id, data.name or '', data.category or '', data.unit or '')
-            )
-            conn.commit()
+        node_db_id = _node_ids.get(data.node_id)
+        if node_db_id is None:
             cursor.execute(
                 "SELECT id FROM nodes WHERE node_id = %s LIMIT 1",
                 (data.node_id,)
             )
             node_row = cursor.fetchone()
 
-        if not node_row:
-            print(f"ERREUR : impossible de récupérer/créer le node {data.node_id}")
-            return False
-
-        node_db_id = node_row['id']
+            if not node_row:
+                cursor.execute(
+                    """
+                    INSERT INTO nodes (node_id, name, category, unit)
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+                    """,
+                    (data.node_id, data.name or '', data.category or '', data.unit or '')
+                )
+                conn.commit()
+                # lastrowid = id existant si un autre processus l'a inséré entre-temps (index unique)
+                node_row = {'id': cursor.lastrowid}
+                # L'API invalide son cache /nodes à la réception de ce message
+                notify_new_measurement({"type": "nodes_changed", "data": {"node_id": data.node_id}})
+
+            if not node_row or not node_row['id']:
+                print(f"ERREUR : impossible de récupérer/créer le node {data.node_id}")
+                return False
+
+            node_db_id = _node_ids[data.node_id] = node_row['id']
 
         numeric_value, text_value = get_storable_values(data.value)
 
         print(f"  Valeur stockée pour {data.name}: "
               f"numeric={numeric_value!r} | text={text_value!r}")
 
-        cursor.execute(
-            """
-            INSERT INTO measurements 
-            (node_id, value, text_value, timestamp)
-            VALUES (%s, %s, %s, FROM_UNIXTIME(%s))
-            """,
-            (node_db_id, numeric_value, text_value, int(data.timestamp))
-        )
+        try:
+            _insert_measurement(conn, cursor, node_db_id, numeric_value, text_value, data.timestamp)
+        except Exception as e:
+            # Schéma migré pendant que le collecteur tourne : nouvelle détection puis second essai
+            if not layout_changed(e):
+                raise
+            _insert_measurement(conn, cursor, node_db_id, numeric_value, text_value, data.timestamp)
         conn.commit()
 
         success = True
         print(f"   → MySQL OK : {data.name} enregistré")
 
+        if data.trace is not None:
+            data.trace["persisted"] = time.time()
+
         # Notification WebSocket
         notify_new_measurement({
             "type": "new_measurement",
             "data": {
+                "id": node_db_id,
                 "node_id": data.node_id,
                 "name": data.name,
                 "category": data.category,
                 "unit": data.unit or None,
                 "numeric_value": numeric_value,
                 "text_value": text_value,
-                "timestamp": str(data.timestamp),
-                "readable_time": str(data.timestamp)
-            }
+                "timestamp": str(int(data.timestamp)),
+                "readable_time": str(int(data.timestamp))
+            },
+            # Trace de latence (échantillons tracés uniquement), complétée par l'API
+            **({"trace": data.trace} if data.trace is not None else {})
         })
 
     except Exception as e:
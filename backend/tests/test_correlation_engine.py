@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from intelligence.correlation_engine import CorrelationEngine
+
+
+def _run(n, ticks=3000, factors=0, fault_at=None, seed=0):
+    """Feed Gaussian noise to one group; returns (exceedance rate after warm-up, outlier alerts)."""
+    rng = np.random.default_rng(seed)
+    tags = [f"ns=2;i={i}" for i in range(n)]
+    loadings = rng.normal(size=(n, factors))
+    engine = CorrelationEngine({"g": tags})
+    group = engine.groups[0]
+    above = watched = 0
+    alerts = []
+    for t in range(ticks):
+        x = loadings @ rng.normal(size=factors) + (0.5 if factors else 1.0) * rng.normal(size=n)
+        if fault_at is not None and t >= fault_at:
+            x[0] += 8.0
+        tick_alerts = engine.update(dict(zip(tags, x.tolist())), timestamp=t)
+        alerts += [a for a in tick_alerts if "|" not in a.node_id]
+        if group.ticks > group.warmup and (fault_at is None or t < fault_at):
+            watched += 1
+            above += group.distance > group.threshold
+    return above / watched, alerts
+
+
+@pytest.mark.parametrize("n", [2, 50, 300])
+def test_independent_noise_false_alarm_rate(n):
+    rate, alerts = _run(n)
+    assert rate < 0.004  # nominal 0.001 per tick
+    assert alerts == []
+
+
+@pytest.mark.parametrize("n", [5, 200])
+def test_correlated_noise_false_alarm_rate(n):
+    rate, _ = _run(n, factors=3, seed=1)
+    assert rate < 0.004
+
+
+def test_lasting_outlier_alerts_once():
+    _, alerts = _run(20, ticks=1500, factors=3, fault_at=1200, seed=2)
+    assert [a.node_id for a in alerts] == ["ns=2;i=0"]
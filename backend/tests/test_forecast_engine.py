@@ -0,0 +1,35 @@
+import random
+from collections import Counter
+
+from intelligence.forecast_engine import ForecastEngine
+from models.data_model import NormalizedData
+
+
+def _feed(engine, values, start=0):
+    alerts = []
+    for t, value in enumerate(values, start):
+        data = NormalizedData("opcua", "ns=2;i=1", "Temperature", "sensor", value, None, float(t))
+        alerts += engine.update([data], now=float(t))
+    return alerts
+
+
+def _ramp(rng, start, end, ticks):
+    return [start + (end - start) * t / ticks + rng.uniform(-0.5, 0.5) for t in range(ticks + 1)]
+
+
+def test_noisy_ramp_warns_once_per_limit():
+    for seed in range(5):
+        alerts = _feed(ForecastEngine(), _ramp(random.Random(seed), 40.0, 100.0, 600))
+        assert Counter(a.severity for a in alerts) == {"INFO": 1, "WARNING": 1}
+
+
+def test_rearmed_after_the_trend_goes_away():
+    rng = random.Random(0)
+    engine = ForecastEngine(horizon=120.0)  # critical (80) is never predicted below 58
+    first = _feed(engine, _ramp(rng, 40.0, 58.0, 180))
+    flat = [40.0 + rng.uniform(-0.5, 0.5) for _ in range(60)]
+    calm = _feed(engine, flat, start=181)
+    second = _feed(engine, _ramp(rng, 40.0, 58.0, 180), start=241)
+    assert [a.severity for a in first] == ["INFO"]
+    assert calm == []
+    assert [a.severity for a in second] == ["INFO"]
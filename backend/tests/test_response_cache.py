@@ -0,0 +1,34 @@
+from starlette.requests import Request
+
+from response_cache import ResponseCache
+
+
+def _request(path="/nodes", headers=()):
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": list(headers)})
+
+
+def test_invalidation_during_producer_is_not_cached():
+    cache = ResponseCache()
+    calls = []
+
+    def producer():
+        calls.append(1)
+        if len(calls) == 1:
+            cache.invalidate("nodes")  # nodes_changed received while the query runs
+        return [{"id": len(calls)}]
+
+    assert cache.respond(_request(), producer, ttl=300, tags=("nodes",)).body == b'[{"id":1}]'
+    assert cache.respond(_request(), producer, ttl=300, tags=("nodes",)).body == b'[{"id":2}]'
+    assert cache.respond(_request(), producer, ttl=300, tags=("nodes",)).body == b'[{"id":2}]'
+    assert len(calls) == 2
+
+
+def test_gzip_variant_has_its_own_etag():
+    cache = ResponseCache()
+    producer = lambda: [{"value": i} for i in range(200)]
+    plain = cache.respond(_request(), producer, ttl=60)
+    gzipped = cache.respond(_request(headers=[(b"accept-encoding", b"gzip")]), producer, ttl=60)
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert plain.headers["etag"] != gzipped.headers["etag"]
+    not_modified = cache.respond(_request(headers=[(b"if-none-match", plain.headers["etag"].encode())]), producer, ttl=60)
+    assert not_modified.status_code == 304
@@ -0,0 +1,59 @@
+import math
+import random
+
+import pytest
+
+from models.data_model import NormalizedData
+from pipeline import AnalyticsPipeline
+from intelligence.sharded_analytics import _to_floats
+
+
+def _ticks(tags=200, ticks=15, seed=1):
+    """Ticks of 200 tags where every tenth is named "Temperature" (browse names are not unique)."""
+    rng = random.Random(seed)
+    out = []
+    for t in range(ticks):
+        batch = []
+        for i in range(tags):
+            name = "Temperature" if i % 10 == 0 else f"Tag{i}"
+            value = 40.0 + i % 30 + rng.gauss(0, 8)
+            batch.append(NormalizedData("opcua", f"ns=2;i={i}", name, "sensor", value, None, 1_700_000_000.0 + t))
+        batch.append(NormalizedData("opcua", "i=2256", "ServerStatus", "system", "Running", None, 1_700_000_000.0 + t))
+        out.append(batch)
+    return out
+
+
+def _run(workers):
+    pipeline = AnalyticsPipeline({"analytics_workers": workers})
+    try:
+        rows = []
+        for batch in _ticks():
+            results, _, _ = pipeline.process(batch)
+            for r in results:
+                rows.append((r["data"].node_id, r["stats"], r["anomaly"],
+                             [(a.severity, a.value, a.timestamp) for a in r["alerts"]]))
+        return rows
+    finally:
+        pipeline.close()
+
+
+def _same(a, b):
+    assert len(a) == len(b)
+    for (nid, stats_a, anomaly_a, alerts_a), (_, stats_b, anomaly_b, alerts_b) in zip(a, b):
+        assert anomaly_a == anomaly_b, nid
+        assert alerts_a == alerts_b, nid
+        assert (stats_a is None) == (stats_b is None), nid
+        if stats_a:
+            for key in ("avg", "min", "max", "count"):
+                assert math.isclose(stats_a[key], stats_b[key], rel_tol=1e-12), (nid, key)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_sharded_matches_inline(workers):
+    _same(_run(0), _run(workers))
+
+
+def test_to_floats_maps_text_to_nan():
+    values = _to_floats([1, "2.5", None, "Running", [1, 2]])
+    assert values[:2].tolist() == [1.0, 2.5]
+    assert all(math.isnan(v) for v in values[2:])
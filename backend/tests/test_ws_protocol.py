@@ -0,0 +1,18 @@
+from ws_protocol import DELTA_ENTRY, DELTA_HEADER, decode_delta, encode_deltas
+
+
+def test_wide_timestamp_spread_is_split_into_frames():
+    # static tag stamped with the server start time, next to live tags
+    entries = [(1, 1_700_000_000.5, 1.0), (2, 1_500_000_000.0, 2.0), (3, 1_700_000_001.25, 3.0)]
+    for compress in (False, True):
+        frames = encode_deltas(entries, compress=compress)
+        assert len(frames) == 2
+        assert sorted(e for frame in frames for e in decode_delta(frame)) == entries
+
+
+def test_one_frame_per_tick_when_timestamps_are_close():
+    entries = [(i, 1_700_000_000.0 + i / 10, float(i)) for i in range(100)]
+    frames = encode_deltas(entries)
+    assert len(frames) == 1
+    assert len(frames[0]) == DELTA_HEADER.size + 100 * DELTA_ENTRY.size
+    assert decode_delta(frames[0]) == entries
@@ -0,0 +1,278 @@
+"""Per-sample latency tracing and on-demand sampling profiler.
+
+A sampled fraction of the readings carries a `trace` dict of UNIX timestamps
+(float seconds) through the pipeline:
+
+    source → server → received → normalized → persisted → broadcast
+
+`source` / `server` come from the OPC UA DataValue (server clock), the others
+from the local clock. The collector records every stage up to `persisted`;
+the trace then travels on the bus and the API process adds `broadcast`.
+"""
+import bisect
+import json
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, List, Optional
+
+STAGES = ("source", "server", "received", "normalized", "persisted", "broadcast")
+
+# Histogram bucket upper bounds in milliseconds (last bucket is open)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+LATENCY_PATH = os.path.join(DATA_DIR, "latency.json")
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+PROFILE_REQUEST_PATH = os.path.join(DATA_DIR, "profile_request.json")
+COLLECTOR_PID_PATH = os.path.join(DATA_DIR, "collector.pid")
+PROFILE_RUNNING_PATH = os.path.join(DATA_DIR, "profile_running.json")
+MAX_PROFILE_SECONDS = 60.0
+
+_profile_lock = threading.Lock()
+
+
+class LatencyHistogram:
+    """Fixed log-scale buckets; cheap to update, percentiles estimated from bucket bounds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.total:
+            return None
+        rank = p * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.total,
+            "mean_ms": round(self.sum_ms / self.total, 3) if self.total else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets_ms": dict(zip([str(b) for b in BUCKETS_MS] + ["inf"], self.counts)),
+        }
+
+
+class Tracer:
+    """Decides which samples are traced and aggregates per-stage latencies."""
+
+    def __init__(self, sample_rate: float = 0.01, dump_path: Optional[str] = None, dump_every: float = 10.0):
+        self.sample_rate = sample_rate
+        self.dump_path = dump_path
+        self.dump_every = dump_every
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.lock = threading.Lock()
+        self._last_dump = time.time()
+
+    def start(self, source: Optional[float] = None, server: Optional[float] = None,
+              received: Optional[float] = None) -> Optional[dict]:
+        """Return a new trace for a sampled reading, None otherwise."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        trace = {"received": received or time.time()}
+        if source:
+            trace["source"] = source
+        if server:
+            trace["server"] = server
+        return trace
+
+    @staticmethod
+    def mark(trace: Optional[dict], stage: str):
+        if trace is not None:
+            trace[stage] = time.time()
+
+    def finish(self, trace: Optional[dict]):
+        """Record the delay between consecutive stages present in the trace, plus end to end."""
+        if not trace:
+            return
+        present = [s for s in STAGES if s in trace]
+        with self.lock:
+            for prev, stage in zip(present, present[1:]):
+                self._add(f"{prev}→{stage}", (trace[stage] - trace[prev]) * 1000)
+            if len(present) > 2:
+                self._add(f"{present[0]}→{present[-1]}", (trace[present[-1]] - trace[present[0]]) * 1000)
+        self.maybe_dump()
+
+    def _add(self, key: str, ms: float):
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = LatencyHistogram()
+        hist.add(max(ms, 0.0))
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "updated_at": time.time(),
+                "stages": {key: hist.to_dict() for key, hist in self.histograms.items()},
+            }
+
+    def maybe_dump(self):
+        if not self.dump_path or time.time() - self._last_dump < self.dump_every:
+            return
+        self._last_dump = time.time()
+        try:
+            os.makedirs(os.path.dirname(self.dump_path), exist_ok=True)
+            tmp = self.dump_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False)
+            os.replace(tmp, self.dump_path)
+        except OSError as e:
+            print(f"Impossible d'écrire les latences : {e}")
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> str:
+    """Sample the stacks of every other thread for `seconds`.
+
+    Returns collapsed stacks ("frame;frame;frame count" per line), the input
+    format of flamegraph.pl / speedscope.
+    """
+    me = threading.get_ident()
+    stacks: Counter = Counter()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            names = [f"{fs.name} ({os.path.basename(fs.filename)}:{fs.lineno})"
+                     for fs in traceback.extract_stack(frame)]
+            stacks[";".join(names)] += 1
+        time.sleep(interval)
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+
+def run_profile(seconds: float, out_dir: str = PROFILE_DIR) -> Optional[str]:
+    """Profile the current process and write the collapsed stacks; returns the file path.
+
+    `seconds` is capped at MAX_PROFILE_SECONDS. Returns None without
+    profiling when a profile is already running.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        print("Profil déjà en cours, demande ignorée")
+        return None
+    try:
+        seconds = min(max(float(seconds), 0.0), MAX_PROFILE_SECONDS)
+        os.makedirs(out_dir, exist_ok=True)
+        with open(PROFILE_RUNNING_PATH, "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "until": time.time() + seconds}, f)
+        path = os.path.join(out_dir, f"profile-{os.getpid()}-{int(time.time())}.folded")
+        folded = sample_stacks(seconds)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(folded + "\n")
+        print(f"Profil enregistré : {path}")
+        return path
+    finally:
+        _remove(PROFILE_RUNNING_PATH)
+        _profile_lock.release()
+
+
+def profile_running() -> bool:
+    """True while a profile started less than its duration ago has not finished."""
+    try:
+        with open(PROFILE_RUNNING_PATH, "r", encoding="utf-8") as f:
+            return json.load(f).get("until", 0) > time.time()
+    except (OSError, ValueError):
+        return False
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _start_ticks(pid: int) -> Optional[str]:
+    """Process start time from /proc (Linux), None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+            # the command name (field 2) may contain spaces: split after its closing parenthesis
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def install_profile_signal(default_seconds: float = 10.0):
+    """On SIGUSR1, profile this process for N seconds in a background thread.
+
+    N comes from PROFILE_REQUEST_PATH when present (written by the API
+    endpoint), `default_seconds` otherwise, capped at MAX_PROFILE_SECONDS.
+    Also writes COLLECTOR_PID_PATH (pid + process start time) so the API
+    knows which process to signal; remove_profile_signal() deletes it on
+    exit. No-op where SIGUSR1 is missing.
+    """
+    import signal
+
+    if not hasattr(signal, "SIGUSR1"):
+        return
+
+    def handler(signum, frame):
+        seconds = default_seconds
+        try:
+            with open(PROFILE_REQUEST_PATH, "r", encoding="utf-8") as f:
+                seconds = float(json.load(f).get("seconds", default_seconds))
+            os.remove(PROFILE_REQUEST_PATH)
+        except (OSError, ValueError):
+            pass
+        seconds = min(seconds, MAX_PROFILE_SECONDS)
+        print(f"Profilage du collecteur pendant {seconds:.0f} s...")
+        threading.Thread(target=run_profile, args=(seconds,), daemon=True).start()
+
+    signal.signal(signal.SIGUSR1, handler)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(COLLECTOR_PID_PATH, "w", encoding="utf-8") as f:
+        json.dump({"pid": os.getpid(), "start": _start_ticks(os.getpid())}, f)
+
+
+def remove_profile_signal():
+    """Delete COLLECTOR_PID_PATH if it still designates this process."""
+    if collector_pid() == os.getpid():
+        _remove(COLLECTOR_PID_PATH)
+
+
+def collector_pid() -> Optional[int]:
+    """PID of the running collector, None if the pid file is missing or stale.
+
+    A file left by a crashed collector may name a PID since reused by another
+    process: where /proc is available the recorded start time must match.
+    """
+    try:
+        with open(COLLECTOR_PID_PATH, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        pid = int(info["pid"])
+        os.kill(pid, 0)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if info.get("start") is not None and _start_ticks(pid) != info["start"]:
+        return None
+    return pid
+
+
+def latest_profiles(limit: int = 10) -> List[str]:
+    try:
+        files = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR) if name.endswith(".folded")]
+    except FileNotFoundError:
+        return []
+    return sorted(files, key=os.path.getmtime, reverse=True)[:limit]
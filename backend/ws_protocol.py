@@ -0,0 +1,141 @@
+"""Compact snapshot + delta protocol for /ws/measurements?protocol=binary.
+
+1. On connect the server sends one JSON text message
+   {"type": "snapshot", "tags": [{id, node_id, name, category, unit,
+   numeric_value, text_value, timestamp}, ...]} holding the latest value of
+   every tag. `id` is the small integer nodes.id used in all later messages.
+   Timestamps are UNIX seconds as floats in every message type.
+2. Every tick, numeric values that changed are sent as binary messages:
+   header  !BdI  type (1 = delta), base timestamp (s, float64), entry count
+   entry   !Iid  tag id (uint32), timestamp offset from base (ms, int32), value (float64)
+   Usually one message per tick; entries whose timestamps lie more than
+   MAX_OFFSET_MS apart (a static tag stamped days ago next to live tags)
+   are split into several messages, each with its own base.
+   If the type byte has the 0x80 bit set, everything after it is zlib-compressed.
+3. Rare events stay JSON: {"type": "tags", "data": [...]} for tags seen for the
+   first time and {"type": "text_delta", "data": [{id, text_value, timestamp}]}.
+"""
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+FRAME_DELTA = 1
+COMPRESSED = 0x80
+COMPRESS_MIN_SIZE = 512  # smaller frames are sent uncompressed
+
+DELTA_HEADER = struct.Struct("!BdI")
+DELTA_ENTRY = struct.Struct("!Iid")
+MAX_OFFSET_MS = 2 ** 31 - 1  # int32 offset: ~24.8 days from the frame base
+
+TAG_FIELDS = ("id", "node_id", "name", "category", "unit")
+
+
+def _timestamp(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def encode_delta(entries: List[Tuple[int, float, float]], compress: bool = False) -> bytes:
+    """Pack (tag_id, timestamp, value) entries into one delta frame.
+
+    The entries must lie within MAX_OFFSET_MS of each other (see encode_deltas).
+    """
+    base = min(ts for _, ts, _ in entries) if entries else 0.0
+    body = bytearray(DELTA_HEADER.pack(FRAME_DELTA, base, len(entries)))
+    for tag_id, ts, value in entries:
+        body += DELTA_ENTRY.pack(tag_id, int(round((ts - base) * 1000)), value)
+    if compress and len(body) >= COMPRESS_MIN_SIZE:
+        return bytes([FRAME_DELTA | COMPRESSED]) + zlib.compress(bytes(body[1:]))
+    return bytes(body)
+
+
+def encode_deltas(entries: List[Tuple[int, float, float]], compress: bool = False) -> List[bytes]:
+    """Pack entries into as few delta frames as their timestamp spread allows."""
+    frames = []
+    run: List[Tuple[int, float, float]] = []
+    for entry in sorted(entries, key=lambda e: e[1]):
+        if run and (entry[1] - run[0][1]) * 1000 >= MAX_OFFSET_MS:
+            frames.append(encode_delta(run, compress))
+            run = []
+        run.append(entry)
+    if run:
+        frames.append(encode_delta(run, compress))
+    return frames
+
+
+def decode_delta(frame: bytes) -> List[Tuple[int, float, float]]:
+    """Inverse of encode_delta (reference implementation for clients)."""
+    if frame[0] & COMPRESSED:
+        frame = bytes([frame[0] & ~COMPRESSED]) + zlib.decompress(frame[1:])
+    _, base, count = DELTA_HEADER.unpack_from(frame)
+    entries = []
+    for i in range(count):
+        tag_id, offset, value = DELTA_ENTRY.unpack_from(frame, DELTA_HEADER.size + i * DELTA_ENTRY.size)
+        entries.append((tag_id, base + offset / 1000.0, value))
+    return entries
+
+
+class TagState:
+    """Latest value of every tag, keyed by nodes.id, kept current from bus batches."""
+
+    def __init__(self):
+        self.tags: Dict[int, dict] = {}
+        self.loaded = False
+
+    def load(self, rows: List[dict]):
+        """Seed from DB rows shaped like the snapshot entries (newer bus values are kept)."""
+        for row in rows:
+            tag = dict(row)
+            if tag.get("timestamp") is not None:
+                tag["timestamp"] = _timestamp(tag["timestamp"])
+            self.tags.setdefault(row["id"], tag)
+        self.loaded = True
+
+    def snapshot(self) -> dict:
+        """Copy of the current state: later apply() calls do not alter a snapshot being sent."""
+        return {"type": "snapshot", "tags": [dict(tag) for tag in self.tags.values()]}
+
+    def apply(self, messages: List[dict]) -> Tuple[List[dict], List[Tuple[int, float, float]], List[dict]]:
+        """Merge a batch of new_measurement messages.
+
+        Returns (new tags, changed numeric entries, changed text values).
+        Only the last sample of a tag within the batch is kept.
+        """
+        new_tags: List[dict] = []
+        numeric: Dict[int, Tuple[int, float, float]] = {}
+        texts: Dict[int, dict] = {}
+
+        for message in messages:
+            if message.get("type") != "new_measurement":
+                continue
+            data = message.get("data") or {}
+            tag_id: Optional[int] = data.get("id")
+            if tag_id is None:
+                continue
+
+            tag = self.tags.get(tag_id)
+            if tag is None:
+                tag = {field: data.get(field) for field in TAG_FIELDS}
+                tag.update(numeric_value=None, text_value=None, timestamp=None)
+                self.tags[tag_id] = tag
+                new_tags.append({field: tag[field] for field in TAG_FIELDS})
+
+            ts = _timestamp(data.get("timestamp"))
+            numeric_value = data.get("numeric_value")
+            text_value = data.get("text_value")
+            tag["timestamp"] = ts
+
+            if text_value is not None:
+                if text_value != tag["text_value"]:
+                    texts[tag_id] = {"id": tag_id, "text_value": text_value, "timestamp": ts}
+                tag["text_value"] = text_value
+                tag["numeric_value"] = None
+            elif numeric_value is not None:
+                if numeric_value != tag["numeric_value"]:
+                    numeric[tag_id] = (tag_id, ts, float(numeric_value))
+                tag["numeric_value"] = numeric_value
+                tag["text_value"] = None
+
+        return new_tags, list(numeric.values()), list(texts.values())
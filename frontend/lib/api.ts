@@ -10,7 +10,7 @@ async function fetchApi<T>(endpoint: string): Promise<T | null> {
       headers: {
         "Content-Type": "application/json",
       },
-      cache: "no-store",
+      cache: "no-cache",
       signal: controller.signal,
     })
 